@@ -0,0 +1,110 @@
+# src/admission.py
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import math
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+from models import AgentResponse
+
+class AgentBusyError(Exception):
+    """Raised instead of queueing when the agent is overloaded"""
+
+    def __init__(self, reason: str, retry_after_s: int):
+        super().__init__(f"{reason} - retry in ~{retry_after_s}s")
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+class AdmissionController:
+    """Bounded admission in front of one shared FlowSupportAgent.
+
+    At most ``max_workers`` requests run at once and at most ``max_queue``
+    more wait for a worker. Anything beyond that fails fast with
+    AgentBusyError carrying an ETA, instead of piling up threads. Each
+    session may have ``per_session_limit`` requests admitted at a time, so
+    one busy tab can't crowd out the others.
+    """
+
+    def __init__(self, agent, max_workers: int = 4, max_queue: int = 8, per_session_limit: int = 1):
+        self.agent = agent
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.per_session_limit = per_session_limit
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-worker")
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._per_session: Counter = Counter()
+
+        # Moving average of service time, used for the retry ETA
+        self._service_ms = 2000.0
+        self._counters = {
+            "admitted": 0,
+            "completed": 0,
+            "rejected_busy": 0,
+            "rejected_session": 0,
+            "queue_time_ms_total": 0,
+            "queue_time_ms_max": 0
+        }
+
+    def submit(self, session_id: str, query: str, timeout_s: Optional[float] = None, **kwargs) -> AgentResponse:
+        """Answer a query through the worker pool, or raise AgentBusyError"""
+        with self._lock:
+            if self._per_session[session_id] >= self.per_session_limit:
+                self._counters["rejected_session"] += 1
+                raise AgentBusyError("Your previous question is still being answered", self._eta_s())
+
+            if self._admitted >= self.max_workers + self.max_queue:
+                self._counters["rejected_busy"] += 1
+                raise AgentBusyError("We're handling a lot of questions right now", self._eta_s())
+
+            self._admitted += 1
+            self._per_session[session_id] += 1
+            self._counters["admitted"] += 1
+
+        future = self._pool.submit(self._run, session_id, time.time(), query, kwargs)
+        return future.result(timeout=timeout_s)
+
+    def metrics(self) -> Dict:
+        """Current load plus admission and queue-time counters"""
+        with self._lock:
+            return {
+                "in_flight": min(self._admitted, self.max_workers),
+                "queued": max(0, self._admitted - self.max_workers),
+                "avg_service_ms": int(self._service_ms),
+                "estimated_wait_s": self._eta_s(),
+                **self._counters
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+    def _run(self, session_id: str, enqueued_at: float, query: str, kwargs: Dict) -> AgentResponse:
+        started_at = time.time()
+        queue_ms = int((started_at - enqueued_at) * 1000)
+
+        try:
+            result = self.agent.generate_response(query, **kwargs)
+            result.queue_time_ms = queue_ms
+            return result
+        finally:
+            service_ms = (time.time() - started_at) * 1000
+            with self._lock:
+                self._admitted -= 1
+                self._per_session[session_id] -= 1
+                if self._per_session[session_id] <= 0:
+                    del self._per_session[session_id]
+
+                self._service_ms = 0.8 * self._service_ms + 0.2 * service_ms
+                self._counters["completed"] += 1
+                self._counters["queue_time_ms_total"] += queue_ms
+                self._counters["queue_time_ms_max"] = max(self._counters["queue_time_ms_max"], queue_ms)
+
+    def _eta_s(self) -> int:
+        # Work ahead of a new request, spread across the workers
+        waves = (self._admitted + 1) / self.max_workers
+        return max(1, math.ceil(waves * self._service_ms / 1000))
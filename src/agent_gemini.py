@@ -1,8 +1,9 @@
 # src/agent_gemini.py
 import google.generativeai as genai
 import os
+import threading
 import time
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from dotenv import load_dotenv
 from pathlib import Path
 import sys
@@ -18,13 +19,28 @@ from models import (
     QueryCategory
 )
 from vector_store import VectorStore
+from tenant_manager import TenantStoreManager
+from escalation_queue import EscalationSink
+from analytics import AnalyticsLog
+from profiling import profiler
+from query_router import categorize_text
+from prompts import PromptBuilder, LocalPrefixCache, REQUIREMENTS_HEADER, DEVICE_CLARIFICATION
 
 load_dotenv()
 
 class FlowSupportAgent:
     """Gemini-powered customer support agent with RAG"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        partitioned_search: bool = False,
+        store_manager: Optional[TenantStoreManager] = None,
+        vector_store=None,
+        llm_concurrency: Optional[int] = None,
+        escalation_sink: Optional[EscalationSink] = None,
+        prefix_cache: Optional[LocalPrefixCache] = None,
+        analytics: Optional[AnalyticsLog] = None
+    ):
         # Configure Gemini
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
@@ -32,17 +48,61 @@ class FlowSupportAgent:
         
         genai.configure(api_key=api_key)
         
-        # Use Gemini 2.0 Flash (best free model)
-        self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        # Use Gemini 2.0 Flash (best free model). The static instructions are set
+        # once as its system instruction; pass a GeminiPrefixCache to serve them
+        # from provider-side context caching instead
+        model_name = 'gemini-2.0-flash-exp'
+        self.prompt_builder = PromptBuilder()
+        self.prefix_cache = prefix_cache or LocalPrefixCache(
+            lambda instruction: genai.GenerativeModel(model_name, system_instruction=instruction)
+        )
+        self.model = self.prefix_cache.model_for(self.prompt_builder.system_instruction)
+        
+        # Optional cap on concurrent Gemini calls when the agent is shared across threads
+        self._llm_slots = threading.BoundedSemaphore(llm_concurrency) if llm_concurrency else None
+        
+        # Escalations are handed to the support teams through this sink, if set
+        self.escalation_sink = escalation_sink
+        
+        # Every response is recorded to this event log, if set
+        self.analytics = analytics
         
-        # Initialize vector store
+        # Shared profiling hooks; switch on with profiler.configure(...) or env vars
+        self.profiler = profiler
+        
+        # Initialize vector store, unless one is passed in (e.g. a ShardedVectorStore)
+        # or many tenants are served through a store manager
         print("🔧 Initializing agent...")
-        self.vector_store = VectorStore()
+        self.store_manager = store_manager
+        if vector_store is None and store_manager is None:
+            vector_store = VectorStore(partitioned=partitioned_search)
+        self.vector_store = vector_store
         print("✅ Agent ready!\n")
     
-    def build_context(self, query: str, n_docs: int = 5) -> Tuple[str, List[RetrievedDocument]]:
+    def _store_for(self, tenant_id: Optional[str]):
+        if self.store_manager is None:
+            return self.vector_store
+        if tenant_id is None:
+            raise ValueError("tenant_id is required when serving multiple knowledge bases")
+        return self.store_manager.get(tenant_id)
+    
+    def _record(self, result: AgentResponse, tenant_id: Optional[str]) -> AgentResponse:
+        if self.analytics is not None:
+            self.analytics.record(result, tenant_id=tenant_id)
+        return result
+    
+    def _call_model(self, prompt: str):
+        # Looked up per call so an expiring cached prefix gets refreshed
+        model = self.prefix_cache.model_for(self.prompt_builder.system_instruction)
+        if self._llm_slots is None:
+            return model.generate_content(prompt)
+        with self._llm_slots:
+            return model.generate_content(prompt)
+    
+    @profiler.track_memory("retrieval")
+    def build_context(self, query: str, n_docs: int = 5, tenant_id: Optional[str] = None) -> Tuple[str, List[RetrievedDocument]]:
         """Retrieve relevant documents and build context"""
-        search_results = self.vector_store.search(query, n_results=n_docs)
+        search_results = self._store_for(tenant_id).search(query, n_results=n_docs)
         
         context_parts = []
         retrieved_docs = []
@@ -50,18 +110,7 @@ class FlowSupportAgent:
         # SMART: If installation query, inject requirements first
         query_lower = query.lower()
         if any(word in query_lower for word in ["install", "won't install", "can't install", "download", "setup"]):
-            requirements_header = """[CRITICAL - CHECK SYSTEM REQUIREMENTS FIRST]
-
-System Requirements:
-- Mac: macOS 12.0 or newer, 500MB free space, microphone, internet
-- Windows: Windows 10 (64-bit) or later, Intel i3/AMD Ryzen 3+, 4GB RAM (8GB recommended), 500MB space, microphone, internet  
-- iPhone: iOS 18.3 or newer, 500MB free space, internet
-
-ALWAYS verify user meets minimum requirements BEFORE providing troubleshooting steps.
----
-
-"""
-            context_parts.append(requirements_header)
+            context_parts.append(REQUIREMENTS_HEADER)
         
         for i, (doc, metadata, distance) in enumerate(zip(
             search_results["documents"],
@@ -69,14 +118,16 @@ ALWAYS verify user meets minimum requirements BEFORE providing troubleshooting s
             search_results["distances"]
         ), 1):
             context_parts.append(
-                f"[Document {i}] (Source: {metadata['source']}, Page: {metadata['page']})\n{doc}\n"
+                self.prompt_builder.document(i, metadata['source'], metadata['page'], doc)
             )
             retrieved_docs.append(
                 RetrievedDocument(
                     content=doc,
                     source=metadata['source'],
                     page=str(metadata['page']),
-                    relevance_score=round(1 - distance, 3)
+                    # Cosine distance spans [0, 2]; opposite vectors count as irrelevant
+                    relevance_score=round(min(max(1 - distance, 0.0), 1.0), 3),
+                    chunk_id=metadata.get('chunk_id')
                 )
             )
         
@@ -184,25 +235,21 @@ ALWAYS verify user meets minimum requirements BEFORE providing troubleshooting s
             suggested_team=None
         )
     
-    def generate_response(self, query: str) -> AgentResponse:
+    @profiler.sampled("generate_response")
+    def generate_response(self, query: str, tenant_id: Optional[str] = None) -> AgentResponse:
         """Generate complete response with RAG"""
         start_time = time.time()
         
         # Retrieve relevant context
-        context, retrieved_docs = self.build_context(query)
+        context, retrieved_docs = self.build_context(query, tenant_id=tenant_id)
+        stage_timings = {"retrieval": int((time.time() - start_time) * 1000)}
         
         # Check if we need clarification FIRST
         needs_clarify, clarify_type = self.needs_clarification(query, retrieved_docs)
         
         if needs_clarify:
             if clarify_type == "device":
-                response_text = """I can help with that! To give you the most accurate solution, could you let me know which device you're using?
-
-- **Mac** (macOS)
-- **Windows** (PC)
-- **iPhone** (iOS)
-
-Just let me know and I'll provide specific instructions for your device!"""
+                response_text = DEVICE_CLARIFICATION
                 
                 confidence = ConfidenceLevel.MEDIUM
                 escalation = EscalationDecision(
@@ -216,91 +263,49 @@ Just let me know and I'll provide specific instructions for your device!"""
                 processing_time = int((time.time() - start_time) * 1000)
                 avg_relevance = sum(d.relevance_score for d in retrieved_docs) / len(retrieved_docs) if retrieved_docs else 0.0
                 
-                return AgentResponse(
+                return self._record(AgentResponse(
                     query=query,
                     response=response_text,
                     escalation=escalation,
                     retrieved_docs=retrieved_docs,
                     confidence=confidence,
                     avg_relevance_score=round(avg_relevance, 3),
-                    processing_time_ms=processing_time
-                )
+                    processing_time_ms=processing_time,
+                    stage_timings_ms=stage_timings
+                ), tenant_id)
         
         # Check escalation
         escalation = self.analyze_escalation(query, retrieved_docs)
+        prompt_tokens = {}
+        llm_error = None
         
         if escalation.should_escalate:
-            response_text = f"""I'd like to connect you with our support team for personalized assistance.
-
-**Why:** {escalation.reason}
-**Team:** {escalation.suggested_team or 'General Support'}
-**Priority:** {escalation.priority}
-
-You can reach support at: support@useflow.ai"""
+            response_text = self.prompt_builder.escalation_reply(escalation)
             
             confidence = ConfidenceLevel.LOW
         else:
-            # Build prompt for Gemini
-            system_prompt = """You are FlowSupport AI, a helpful customer success agent for Wispr Flow.
-
-Your role:
-- Answer questions using ONLY the provided documentation
-- BE CONCISE and natural - like helping a colleague
-- For installation issues: ALWAYS check system requirements FIRST
-- For troubleshooting: Provide specific solutions
-- Match Wispr Flow's voice: professional but approachable
-
-Installation Issue Protocol:
-When user says Flow "won't install" or "can't install":
-1. **FIRST:** State minimum requirements for their device
-2. **THEN:** Ask if they meet these requirements  
-3. **ONLY IF they meet requirements:** Provide troubleshooting steps
-
-System Requirements (memorize these):
-- Mac: macOS 12.0+, 500MB space, microphone, internet
-- Windows: Windows 10 64-bit+, Intel i3/Ryzen 3+, 4GB RAM (8GB rec), 500MB space, microphone, internet
-- iPhone: iOS 18.3+, 500MB space, internet
-
-Example Installation Response:
-❌ BAD: "Try these 10 troubleshooting steps..." [too long, skips requirements]
-✅ GOOD: "Flow requires iOS 18.3+ and 500MB free space. Check Settings → General → About for your iOS version. If below 18.3, update iOS first. Let me know if you meet these!"
-
-Conversation Style:
-- Keep responses under 100 words for requirements checks
-- Keep other responses under 150 words
-- Give COMPLETE answers with clear next steps
-- End naturally: "Hope that helps!", "Let me know if you need anything else!"
-- Never ask "Does that answer your question?"
-- Be warm and human, not robotic
-
-Guidelines:
-- Don't make up information
-- Check requirements BEFORE troubleshooting
-- Be helpful and complete
-- End warmly and naturally"""
-
-            user_prompt = f"""User Question: {query}
-
-Relevant Documentation:
-{context}
-
-Instructions:
-1. Identify if this is an INSTALLATION or SETUP issue
-2. If installation: START with system requirements check (under 100 words)
-3. Ask user to verify requirements BEFORE providing other troubleshooting
-4. If NOT installation: provide complete answer (under 150 words)
-5. End naturally: "Let me know if that works!" or "Hope that helps!"
-
-Provide a helpful, accurate, COMPLETE response."""
+            # Only the dynamic part is assembled per request
+            user_prompt = self.prompt_builder.user_prompt(query, context)
+            prompt_tokens = self.prompt_builder.token_counts(user_prompt)
 
             # Call Gemini
+            generation_start = time.time()
             try:
-                response = self.model.generate_content(user_prompt)
+                response = self._call_model(user_prompt)
                 response_text = response.text
             except Exception as e:
+                llm_error = str(e)
                 response_text = f"I encountered an error processing your question. Please try rephrasing or contact support. Error: {str(e)}"
                 confidence = ConfidenceLevel.LOW
-                escalation.should_escalate = True
+                # The customer still needs an answer, so hand it to a person
+                escalation = EscalationDecision(
+                    should_escalate=True,
+                    reason="Automated answer failed (model error) - needs a human reply",
+                    category=categorize_text(query),
+                    priority="medium",
+                    suggested_team="general"
+                )
+            stage_timings["generation"] = int((time.time() - generation_start) * 1000)
             
             # Calculate confidence
             avg_relevance = sum(d.relevance_score for d in retrieved_docs) / len(retrieved_docs)
@@ -311,18 +316,24 @@ Provide a helpful, accurate, COMPLETE response."""
             else:
                 confidence = ConfidenceLevel.LOW
         
+        if escalation.should_escalate and self.escalation_sink is not None:
+            self.escalation_sink.submit(query, escalation, retrieved_docs)
+        
         processing_time = int((time.time() - start_time) * 1000)
         avg_relevance = sum(d.relevance_score for d in retrieved_docs) / len(retrieved_docs) if retrieved_docs else 0.0
         
-        return AgentResponse(
+        return self._record(AgentResponse(
             query=query,
             response=response_text,
             escalation=escalation,
             retrieved_docs=retrieved_docs,
             confidence=confidence,
             avg_relevance_score=round(avg_relevance, 3),
-            processing_time_ms=processing_time
-        )
+            processing_time_ms=processing_time,
+            prompt_tokens=prompt_tokens,
+            stage_timings_ms=stage_timings,
+            llm_error=llm_error
+        ), tenant_id)
 
 if __name__ == "__main__":
     # Test the agent
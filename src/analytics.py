@@ -0,0 +1,328 @@
+# src/analytics.py
+import hashlib
+import os
+import queue
+import re
+import threading
+import time
+import warnings
+from datetime import timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent))
+from models import AgentResponse, ConfidenceLevel, QueryCategory
+from query_router import categorize_text
+
+# Dictionary-encoded columns are stored as uint8 codes into these vocabularies
+CATEGORIES = [category.value for category in QueryCategory]
+CONFIDENCES = [level.value for level in ConfidenceLevel]
+STAGES = ["retrieval", "generation", "total"]
+
+_STOP = object()
+
+# Fill values for columns missing from older segments
+_COLUMN_DEFAULTS = {"reason": ""}
+
+def reason_label(result: AgentResponse) -> str:
+    """Readable reason a response went unanswered, without per-query details
+
+    Escalation reasons carry specifics after ':' or ' - ' (the matched
+    trigger, the relevance score), which are dropped so reasons group.
+    """
+    if result.escalation.should_escalate:
+        return re.split(r":| - ", result.escalation.reason, maxsplit=1)[0].strip()
+    if result.confidence == ConfidenceLevel.LOW.value:
+        return "Low confidence answer"
+    return ""
+
+def query_hash(query: str) -> int:
+    """Stable 64-bit hash of the normalized query text (no raw text is stored)"""
+    digest = hashlib.blake2b(" ".join(query.lower().split()).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, "little") >> 1
+
+class AnalyticsLog:
+    """Columnar event log of every AgentResponse.
+
+    record() only enqueues, so the request path never waits on disk. A
+    background writer buffers events in memory and writes them as NumPy
+    .npz segments, one per ``segment_interval_s`` window (or every
+    ``max_segment_rows`` events), named by their time range so queries can
+    skip segments outside the range they ask for. Each column is stored as
+    its own typed array; retrieved chunk IDs are a flat array plus offsets.
+    """
+
+    def __init__(
+        self,
+        directory: str = "data/analytics",
+        segment_interval_s: float = 60.0,
+        max_segment_rows: int = 100000,
+        max_queue: int = 10000
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_interval_s = segment_interval_s
+        self.max_segment_rows = max_segment_rows
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._counters = {"recorded": 0, "written": 0, "dropped": 0, "segments": 0, "write_errors": 0}
+
+        self._writer = threading.Thread(target=self._run, name="analytics-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, result: AgentResponse, tenant_id: Optional[str] = None) -> bool:
+        """Enqueue one response without blocking; returns False if the buffer is full"""
+        timings = result.stage_timings_ms
+        event = (
+            # AgentResponse timestamps are naive UTC
+            result.timestamp.replace(tzinfo=timezone.utc).timestamp(),
+            query_hash(result.query),
+            CATEGORIES.index(categorize_text(result.query).value),
+            CONFIDENCES.index(result.confidence),
+            result.escalation.should_escalate,
+            result.escalation.suggested_team or "",
+            reason_label(result),
+            tenant_id or "",
+            result.avg_relevance_score,
+            # Stages that did not run (e.g. no Gemini call for clarifications
+            # and escalations) are NaN, so they don't drag percentiles down
+            timings.get("retrieval", np.nan),
+            timings.get("generation", np.nan),
+            result.processing_time_ms,
+            [doc.chunk_id for doc in result.retrieved_docs if doc.chunk_id is not None]
+        )
+
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self._counters["dropped"] += 1
+            return False
+
+        with self._lock:
+            self._counters["recorded"] += 1
+        return True
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {"buffered": self._queue.qsize(), **self._counters}
+
+    def flush(self):
+        """Block until everything recorded so far is on disk"""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        """Write buffered events and stop the writer"""
+        self._queue.put(_STOP)
+        self._writer.join()
+
+    def _run(self):
+        events: List[tuple] = []
+        window_start = time.time()
+
+        while True:
+            timeout = max(0.0, window_start + self.segment_interval_s - time.time())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, tuple):
+                events.append(item)
+                if len(events) < self.max_segment_rows:
+                    continue
+
+            # Window elapsed, segment full, or a flush/close was requested
+            if events:
+                self._write_segment(events)
+                events = []
+            window_start = time.time()
+
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is _STOP:
+                break
+
+    def _write_segment(self, events: List[tuple]):
+        (ts, hashes, categories, confidences, escalated, teams, reasons, tenants,
+         relevance, retrieval_ms, generation_ms, total_ms, chunk_lists) = zip(*events)
+
+        columns = {
+            "ts": np.array(ts, dtype=np.float64),
+            "query_hash": np.array(hashes, dtype=np.int64),
+            "category": np.array(categories, dtype=np.uint8),
+            "confidence": np.array(confidences, dtype=np.uint8),
+            "escalated": np.array(escalated, dtype=bool),
+            "team": np.array(teams, dtype=str),
+            "reason": np.array(reasons, dtype=str),
+            "tenant": np.array(tenants, dtype=str),
+            "avg_relevance": np.array(relevance, dtype=np.float32),
+            "retrieval_ms": np.array(retrieval_ms, dtype=np.float32),
+            "generation_ms": np.array(generation_ms, dtype=np.float32),
+            "total_ms": np.array(total_ms, dtype=np.int32),
+            "chunk_offsets": np.cumsum([0] + [len(ids) for ids in chunk_lists], dtype=np.int64),
+            "chunk_ids": np.array([i for ids in chunk_lists for i in ids], dtype=np.int64)
+        }
+
+        start_ms, end_ms = int(columns["ts"].min() * 1000), int(columns["ts"].max() * 1000)
+        with self._lock:
+            sequence = self._counters["segments"]
+        path = self.directory / f"events-{start_ms}-{end_ms}-{os.getpid()}-{sequence}.npz"
+        tmp_path = path.with_suffix(".tmp")
+
+        # Write then rename, so readers never see a half-written segment
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **columns)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            with self._lock:
+                self._counters["write_errors"] += 1
+            print(f"❌ Failed to write {len(events)} analytics events: {e}")
+            return
+
+        with self._lock:
+            self._counters["written"] += len(events)
+            self._counters["segments"] += 1
+
+def _segments(directory: str, since: Optional[float], until: Optional[float]) -> List[Path]:
+    paths = []
+    for path in sorted(Path(directory).glob("events-*.npz")):
+        start_ms, end_ms = (int(part) for part in path.stem.split("-")[1:3])
+        if since is not None and end_ms < since * 1000:
+            continue
+        if until is not None and start_ms > until * 1000:
+            continue
+        paths.append(path)
+    return paths
+
+def load_events(
+    directory: str = "data/analytics",
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    with_chunks: bool = False
+) -> pd.DataFrame:
+    """Events between two epoch timestamps as a DataFrame.
+
+    Only segments overlapping the range are opened. Retrieved chunk IDs are
+    skipped unless ``with_chunks`` is set, since they're the costly column.
+    """
+    parts: Dict[str, List[np.ndarray]] = {}
+    chunk_lists: List[List[int]] = []
+
+    for path in _segments(directory, since, until):
+        with np.load(path) as segment:
+            ts = segment["ts"]
+            mask = np.ones(len(ts), dtype=bool)
+            if since is not None:
+                mask &= ts >= since
+            if until is not None:
+                mask &= ts < until
+
+            for name in segment.files:
+                if name not in ("chunk_ids", "chunk_offsets"):
+                    parts.setdefault(name, []).append(segment[name][mask])
+            # Columns added after a segment was written read as their default
+            for name, default in _COLUMN_DEFAULTS.items():
+                if name not in segment.files:
+                    parts.setdefault(name, []).append(np.full(int(mask.sum()), default))
+
+            if with_chunks:
+                ids, offsets = segment["chunk_ids"], segment["chunk_offsets"]
+                chunk_lists.extend(
+                    ids[offsets[i]:offsets[i + 1]].tolist() for i in np.flatnonzero(mask)
+                )
+
+    if not parts:
+        return pd.DataFrame(columns=["ts", "query_hash", "category", "confidence", "escalated", "team", "reason",
+                                     "tenant", "avg_relevance", "retrieval_ms", "generation_ms", "total_ms"])
+
+    columns = {name: np.concatenate(arrays) for name, arrays in parts.items()}
+    events = pd.DataFrame(columns)
+    events["ts"] = pd.to_datetime(events["ts"], unit="s")
+    events["category"] = pd.Categorical.from_codes(events["category"], CATEGORIES)
+    events["confidence"] = pd.Categorical.from_codes(events["confidence"], CONFIDENCES)
+    events["team"] = events["team"].astype("category")
+    events["reason"] = events["reason"].astype("category")
+    events["tenant"] = events["tenant"].astype("category")
+    if with_chunks:
+        events["chunk_ids"] = chunk_lists
+    return events
+
+def _unanswered(events: pd.DataFrame) -> pd.Series:
+    # Escalated, or answered with low confidence
+    return events["escalated"] | (events["confidence"] == ConfidenceLevel.LOW.value)
+
+def resolution_rate(events: pd.DataFrame, by: Optional[str] = None):
+    """Share of queries answered without escalation or low confidence, overall or per ``by``"""
+    resolved = ~_unanswered(events)
+    if by is None:
+        return float(resolved.mean()) if len(events) else 0.0
+    return resolved.groupby(events[by], observed=True).mean()
+
+def top_unanswered_topics(
+    events: pd.DataFrame,
+    n: int = 10,
+    by: Sequence[str] = ("category", "reason", "team")
+) -> pd.DataFrame:
+    """Most frequent unanswered (category, reason, team) groups.
+
+    Each row also has its escalation share and how many distinct queries
+    (by hash) fell into it, to tell one repeated question from a broad gap.
+    """
+    unanswered = events[_unanswered(events)]
+    grouped = unanswered.groupby(list(by), observed=True).agg(
+        count=("escalated", "size"),
+        distinct_queries=("query_hash", "nunique"),
+        escalated=("escalated", "mean"),
+        avg_relevance=("avg_relevance", "mean"),
+        last_seen=("ts", "max")
+    )
+    return grouped.sort_values("count", ascending=False).head(n).reset_index()
+
+def latency_percentiles(events: pd.DataFrame, percentiles: Sequence[float] = (50, 95, 99)) -> pd.DataFrame:
+    """Per-stage latency percentiles in ms (rows: stage, columns: p50, p95, ...)
+
+    Each stage only counts the queries it ran for; a stage that never ran
+    reports NaN.
+    """
+    stages = events[[f"{stage}_ms" for stage in STAGES]].to_numpy(dtype=np.float64)
+    if not len(stages):
+        values = np.zeros((len(percentiles), len(STAGES)))
+    else:
+        with warnings.catch_warnings():
+            # All-NaN stages are expected, not an error
+            warnings.simplefilter("ignore", RuntimeWarning)
+            values = np.nanpercentile(stages, percentiles, axis=0)
+    return pd.DataFrame(values.T, index=STAGES, columns=[f"p{p:g}" for p in percentiles]).round(1)
+
+def chunk_frequency(events: pd.DataFrame, n: int = 20) -> pd.Series:
+    """Most retrieved chunk IDs (needs events loaded with_chunks=True)"""
+    ids = np.fromiter((i for chunk_ids in events["chunk_ids"] for i in chunk_ids), dtype=np.int64)
+    values, counts = np.unique(ids, return_counts=True)
+    order = np.argsort(counts)[::-1][:n]
+    return pd.Series(counts[order], index=values[order], name="retrievals")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize the analytics event log")
+    parser.add_argument("--directory", default="data/analytics")
+    parser.add_argument("--hours", type=float, default=24.0, help="Look back this many hours")
+    args = parser.parse_args()
+
+    events = load_events(args.directory, since=time.time() - args.hours * 3600)
+    print(f"\n📊 {len(events)} responses in the last {args.hours:g}h\n")
+    if len(events):
+        print(f"✅ Resolution rate: {resolution_rate(events):.1%}\n")
+        print("⏱️  Latency (ms):")
+        print(latency_percentiles(events).to_string())
+        print("\n❓ Top unanswered topics:")
+        print(top_unanswered_topics(events).to_string(index=False))
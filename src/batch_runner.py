@@ -0,0 +1,230 @@
+# src/batch_runner.py
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+class Checkpoint:
+    """Settled input lines, kept as a contiguous watermark plus the few above it.
+
+    Workers finish out of order, so lines at or past ``next_line`` may already
+    be done. The set above the watermark is bounded by the number of queries
+    in flight, so the checkpoint stays small however large the input is.
+    Lines that failed still advance the watermark but are listed in
+    ``failed``, so a rerun retries them.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.next_line = 0
+        self.done = set()
+        self.failed = set()
+
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.next_line = state["next_line"]
+            self.done = set(state["done"])
+            self.failed = set(state.get("failed", []))
+
+    @property
+    def resume_line(self) -> int:
+        """First line a rerun has to look at"""
+        return min(self.failed, default=self.next_line)
+
+    def is_done(self, line: int) -> bool:
+        if line in self.failed:
+            return False
+        return line < self.next_line or line in self.done
+
+    def mark(self, line: int, failed: bool = False):
+        if failed:
+            self.failed.add(line)
+        else:
+            self.failed.discard(line)
+
+        if line < self.next_line:
+            return
+        self.done.add(line)
+        while self.next_line in self.done:
+            self.done.remove(self.next_line)
+            self.next_line += 1
+
+    def save(self):
+        """Write atomically so a crash never leaves a torn checkpoint"""
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"next_line": self.next_line, "done": sorted(self.done), "failed": sorted(self.failed)}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+def iter_queries(path: Path, field: str, id_field: str, start_line: int = 0) -> Iterator[Tuple[int, Optional[str], Optional[str]]]:
+    """Stream (line number, record id, query) from a JSONL file.
+
+    Unusable lines (blank, invalid JSON, no query) come through with a None
+    query so the caller can still mark them as settled.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f):
+            if line_number < start_line:
+                continue
+            if not line.strip():
+                yield line_number, None, None
+                continue
+
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"⚠️  Line {line_number + 1}: invalid JSON, skipping")
+                yield line_number, None, None
+                continue
+
+            query = record.get(field) if isinstance(record, dict) else record
+            if not query:
+                print(f"⚠️  Line {line_number + 1}: no '{field}' field, skipping")
+                yield line_number, None, None
+                continue
+
+            record_id = record.get(id_field) if isinstance(record, dict) else None
+            yield line_number, record_id, str(query)
+
+def run_batch(
+    agent,
+    input_path: Path,
+    output_path: Path,
+    checkpoint_path: Path,
+    field: str = "query",
+    id_field: str = "id",
+    workers: int = 8,
+    max_in_flight: int = 32,
+    checkpoint_every: int = 20
+) -> Dict:
+    """Answer every query in input_path, appending AgentResponses to output_path.
+
+    Resumes from checkpoint_path if present. Output lines are flushed before
+    the checkpoint that covers them, so a crash can repeat (never lose) the
+    last few queries; consumers can dedupe on the ``line`` field. Queries
+    that fail (including Gemini errors the agent turned into a fallback
+    reply) are written with an ``error`` field and retried on the next run.
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    stats = {"processed": 0, "errors": 0, "skipped": 0, "escalations": 0, "latency_ms_total": 0, "latency_ms_max": 0, "unsaved": 0}
+
+    def answer(line_number: int, record_id: Optional[str], query: str) -> Dict:
+        record = {"line": line_number, "id": record_id, "query": query}
+        try:
+            result = agent.generate_response(query)
+            if result.llm_error:
+                record["error"] = result.llm_error
+            else:
+                record["response"] = json.loads(result.json())
+        except Exception as e:
+            record["error"] = str(e)
+        return record
+
+    def collect(futures, out):
+        for future in futures:
+            record = future.result()
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+            stats["processed"] += 1
+            if "error" in record:
+                stats["errors"] += 1
+            else:
+                latency = record["response"]["processing_time_ms"]
+                stats["latency_ms_total"] += latency
+                stats["latency_ms_max"] = max(stats["latency_ms_max"], latency)
+                if record["response"]["escalation"]["should_escalate"]:
+                    stats["escalations"] += 1
+
+            checkpoint.mark(record["line"], failed="error" in record)
+            stats["unsaved"] += 1
+
+        out.flush()
+        if stats["unsaved"] >= checkpoint_every:
+            checkpoint.save()
+            stats["unsaved"] = 0
+
+    start_time = time.time()
+    resumed_from = checkpoint.resume_line
+
+    with ThreadPoolExecutor(max_workers=workers) as pool, open(output_path, 'a', encoding='utf-8') as out:
+        in_flight = set()
+
+        for line_number, record_id, query in iter_queries(input_path, field, id_field, checkpoint.resume_line):
+            if checkpoint.is_done(line_number):
+                continue
+            if query is None:
+                checkpoint.mark(line_number)
+                stats["skipped"] += 1
+                continue
+
+            # Bounded submission keeps memory flat regardless of input size
+            if len(in_flight) >= max_in_flight:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(finished, out)
+
+            in_flight.add(pool.submit(answer, line_number, record_id, query))
+
+        if in_flight:
+            finished, _ = wait(in_flight)
+            collect(finished, out)
+
+    checkpoint.save()
+
+    elapsed = time.time() - start_time
+    answered = stats["processed"] - stats["errors"]
+    return {
+        "processed": stats["processed"],
+        "errors": stats["errors"],
+        "skipped": stats["skipped"],
+        "escalations": stats["escalations"],
+        "resumed_from_line": resumed_from,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_qps": round(stats["processed"] / elapsed, 2) if elapsed > 0 else 0.0,
+        "avg_latency_ms": int(stats["latency_ms_total"] / answered) if answered else 0,
+        "max_latency_ms": stats["latency_ms_max"]
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of queries with FlowSupport AI")
+    parser.add_argument("input", type=Path, help="JSONL file with one query per line")
+    parser.add_argument("output", type=Path, help="JSONL file to append responses to")
+    parser.add_argument("--field", default="query", help="Field holding the query text")
+    parser.add_argument("--id-field", default="id", help="Field holding the record id")
+    parser.add_argument("--workers", type=int, default=8, help="Worker threads")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="Max concurrent Gemini calls")
+    parser.add_argument("--max-in-flight", type=int, default=32, help="Max queries queued or running")
+    parser.add_argument("--checkpoint", type=Path, help="Checkpoint file (default: <output>.checkpoint)")
+    args = parser.parse_args()
+
+    from agent_gemini import FlowSupportAgent
+
+    agent = FlowSupportAgent(llm_concurrency=args.llm_concurrency)
+    checkpoint_path = args.checkpoint or args.output.with_suffix(args.output.suffix + ".checkpoint")
+
+    print(f"📥 Answering queries from: {args.input}")
+    summary = run_batch(
+        agent,
+        args.input,
+        args.output,
+        checkpoint_path,
+        field=args.field,
+        id_field=args.id_field,
+        workers=args.workers,
+        max_in_flight=args.max_in_flight
+    )
+
+    print(f"\n✅ Processed {summary['processed']} queries ({summary['errors']} errors, {summary['skipped']} skipped, {summary['escalations']} escalations)")
+    if summary['errors']:
+        print("🔁 Re-run the same command to retry the failed queries")
+    print(f"⏱️  {summary['elapsed_s']}s - {summary['throughput_qps']} queries/s")
+    print(f"📊 Latency: avg {summary['avg_latency_ms']}ms, max {summary['max_latency_ms']}ms")
+    print(f"💾 Saved to: {args.output}")
@@ -0,0 +1,175 @@
+# src/chunk_store.py
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+from models import DocumentChunk, QueryCategory
+
+# Fixed-width chunk record: text byte offset, text byte length,
+# page number, source id, category id
+_RECORD = struct.Struct("<QIIHB")
+_CATEGORIES = [category.value for category in QueryCategory]
+
+class ChunkStore:
+    """Append-only chunk store with page text stored once.
+
+    Layout of the store directory:
+    - pages.txt: UTF-8 page text, each page written once
+    - chunks.idx: one fixed-width record per chunk pointing into pages.txt
+    - sources.json: source file names, indexed by the records' source id
+
+    Chunk IDs are record positions, so lookups are O(1) slices of mmapped
+    files and chunk text is only materialized when it is read.
+    """
+
+    def __init__(self, directory: str = "data/processed/chunk_store"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self.text_path = self.directory / "pages.txt"
+        self.index_path = self.directory / "chunks.idx"
+        self.sources_path = self.directory / "sources.json"
+
+        self._sources: List[str] = []
+        if self.sources_path.exists():
+            with open(self.sources_path, 'r', encoding='utf-8') as f:
+                self._sources = json.load(f)
+        self._source_ids = {name: i for i, name in enumerate(self._sources)}
+
+        self._text_map: Optional[mmap.mmap] = None
+        self._index_map: Optional[mmap.mmap] = None
+
+    def append_page(
+        self,
+        source: str,
+        page_number: int,
+        text: str,
+        spans: List[Tuple[int, int]],
+        categories: List[str]
+    ) -> List[int]:
+        """Append one page and its chunk spans (character offsets), returning chunk IDs"""
+        source_id = self._source_id(source)
+
+        data = text.encode('utf-8')
+        byte_offsets = self._byte_offsets(text, spans)
+
+        # Text goes first so a crash never leaves records pointing past the end
+        with open(self.text_path, 'ab') as f:
+            base = f.tell()
+            f.write(data)
+
+        first_id = len(self)
+        with open(self.index_path, 'ab') as f:
+            for (start, end), category in zip(spans, categories):
+                byte_start, byte_end = byte_offsets[start], byte_offsets[end]
+                f.write(_RECORD.pack(
+                    base + byte_start,
+                    byte_end - byte_start,
+                    page_number,
+                    source_id,
+                    _CATEGORIES.index(category or "general")
+                ))
+
+        self._close_maps()
+        return list(range(first_id, first_id + len(spans)))
+
+    def text(self, chunk_id: int) -> str:
+        """Materialize the text of one chunk"""
+        offset, length, _, _, _ = self._record(chunk_id)
+        return self._text()[offset:offset + length].decode('utf-8')
+
+    def get(self, chunk_id: int) -> DocumentChunk:
+        """Load one chunk by ID"""
+        offset, length, page, source_id, category_id = self._record(chunk_id)
+        return DocumentChunk(
+            text=self._text()[offset:offset + length].decode('utf-8'),
+            source=self._sources[source_id],
+            page=page,
+            chunk_id=chunk_id,
+            category=_CATEGORIES[category_id]
+        )
+
+    def iter_chunks(self, start: int = 0) -> Iterator[DocumentChunk]:
+        """Stream chunks in ID order without loading the index into memory"""
+        for chunk_id in range(start, len(self)):
+            yield self.get(chunk_id)
+
+    def reset(self):
+        """Delete all stored pages and chunks"""
+        self._close_maps()
+        for path in (self.text_path, self.index_path, self.sources_path):
+            if path.exists():
+                path.unlink()
+        self._sources = []
+        self._source_ids = {}
+
+    def close(self):
+        """Release mmapped files"""
+        self._close_maps()
+
+    def __len__(self) -> int:
+        if not self.index_path.exists():
+            return 0
+        # A torn trailing record from an interrupted append is ignored
+        return self.index_path.stat().st_size // _RECORD.size
+
+    def __getitem__(self, chunk_id: int) -> DocumentChunk:
+        return self.get(chunk_id)
+
+    def __iter__(self) -> Iterator[DocumentChunk]:
+        return self.iter_chunks()
+
+    def _source_id(self, source: str) -> int:
+        if source not in self._source_ids:
+            self._source_ids[source] = len(self._sources)
+            self._sources.append(source)
+
+            tmp_path = self.sources_path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._sources, f, ensure_ascii=False)
+            os.replace(tmp_path, self.sources_path)
+
+        return self._source_ids[source]
+
+    def _byte_offsets(self, text: str, spans: List[Tuple[int, int]]) -> dict:
+        """Map each span boundary from a character offset to a UTF-8 byte offset"""
+        offsets = {0: 0}
+        previous = 0
+        for position in sorted({pos for span in spans for pos in span}):
+            offsets[position] = offsets[previous] + len(text[previous:position].encode('utf-8'))
+            previous = position
+        return offsets
+
+    def _record(self, chunk_id: int) -> Tuple[int, int, int, int, int]:
+        # Bounded by the open map, so a lookup costs no filesystem call
+        index = self._index()
+        if not 0 <= chunk_id < len(index) // _RECORD.size:
+            raise IndexError(f"Chunk {chunk_id} not in store")
+        return _RECORD.unpack_from(index, chunk_id * _RECORD.size)
+
+    def _text(self) -> mmap.mmap:
+        if self._text_map is None:
+            with open(self.text_path, 'rb') as f:
+                self._text_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._text_map
+
+    def _index(self) -> Union[mmap.mmap, bytes]:
+        if self._index_map is None:
+            # Empty files can't be mmapped
+            if not len(self):
+                return b""
+            with open(self.index_path, 'rb') as f:
+                self._index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._index_map
+
+    def _close_maps(self):
+        for mapped in (self._text_map, self._index_map):
+            if mapped is not None:
+                mapped.close()
+        self._text_map = None
+        self._index_map = None
@@ -1,14 +1,18 @@
 # src/data_processing.py
 import pdfplumber
+import os
+import shutil
 from pathlib import Path
-from typing import List, Dict
-import json
+from typing import List, Dict, Tuple
 import sys
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
 
 from models import DocumentChunk, QueryCategory
+from chunk_store import ChunkStore
+from query_router import categorize_text
+from profiling import profiler
 
 class DocumentProcessor:
     def __init__(self, data_dir: str = "data/raw"):
@@ -34,21 +38,45 @@ class DocumentProcessor:
             "total_pages": len(pages)
         }
     
+    def chunk_spans(self, text: str, chunk_size: int = 500, overlap: int = 50) -> Tuple[str, List[Tuple[int, int]]]:
+        """Normalize page text and locate its overlapping word windows.
+        
+        Returns the whitespace-normalized text and the (start, end) character
+        offsets of each window in it, so chunks can be sliced instead of copied.
+        """
+        words = text.split()
+        normalized = " ".join(words)
+        
+        # Character offset of each word in the normalized text
+        starts = []
+        position = 0
+        for word in words:
+            starts.append(position)
+            position += len(word) + 1
+        
+        spans = []
+        for i in range(0, len(words), chunk_size - overlap):
+            last = min(i + chunk_size, len(words)) - 1
+            start, end = starts[i], starts[last] + len(words[last])
+            
+            # Skip very short chunks
+            if end - start < 50:
+                continue
+            
+            spans.append((start, end))
+        
+        return normalized, spans
+    
     def chunk_document(self, doc: Dict, chunk_size: int = 500, overlap: int = 50) -> List[DocumentChunk]:
         """Smart chunking with context preservation"""
         chunks = []
         
         for page in doc["pages"]:
-            text = page["content"]
-            words = text.split()
+            text, spans = self.chunk_spans(page["content"], chunk_size, overlap)
             
             # Create overlapping chunks
-            for i in range(0, len(words), chunk_size - overlap):
-                chunk_text = " ".join(words[i:i + chunk_size])
-                
-                # Skip very short chunks
-                if len(chunk_text) < 50:
-                    continue
+            for start, end in spans:
+                chunk_text = text[start:end]
                 
                 # Categorize based on keywords
                 category = self._categorize_chunk(chunk_text)
@@ -67,35 +95,25 @@ class DocumentProcessor:
     
     def _categorize_chunk(self, text: str) -> QueryCategory:
         """Categorize chunk based on content"""
-        text_lower = text.lower()
-        
-        # Billing keywords
-        if any(word in text_lower for word in ["trial", "subscription", "pricing", "billing", "payment", "upgrade", "pro plan", "cancel"]):
-            return QueryCategory.BILLING
-        
-        # Technical keywords
-        if any(word in text_lower for word in ["troubleshoot", "error", "not working", "issue", "fix", "desktop", "ios", "install"]):
-            return QueryCategory.TECHNICAL
-        
-        # Account keywords
-        if any(word in text_lower for word in ["account", "sign up", "login", "password", "delete"]):
-            return QueryCategory.ACCOUNT
-        
-        # Product keywords
-        if any(word in text_lower for word in ["feature", "use case", "workflow", "app", "integration", "dictation"]):
-            return QueryCategory.PRODUCT
-        
-        return QueryCategory.GENERAL
+        return categorize_text(text)
     
-    def process_all_documents(self) -> List[DocumentChunk]:
-        """Process all PDFs in data directory"""
-        all_chunks = []
-        
+    @profiler.track_memory("process_all_documents")
+    def process_all_documents(self, output_dir: str = "data/processed/chunk_store") -> ChunkStore:
+        """Process all PDFs in data directory into a chunk store.
+        
+        The store is built in a sibling directory and only swapped in once
+        processing finishes, so a failed run keeps the previous store.
+        """
+        output_dir = Path(output_dir)
         pdf_files = list(self.data_dir.glob("*.pdf"))
         
         if not pdf_files:
             print("❌ No PDF files found in data/raw/")
-            return []
+            return ChunkStore(str(output_dir))
+        
+        build_dir = output_dir.with_name(output_dir.name + ".building")
+        shutil.rmtree(build_dir, ignore_errors=True)
+        store = ChunkStore(str(build_dir))
         
         print(f"\n📚 Found {len(pdf_files)} PDF files")
         print("🔄 Processing documents...\n")
@@ -103,26 +121,41 @@ class DocumentProcessor:
         for pdf_file in pdf_files:
             try:
                 doc = self.extract_pdf_text(pdf_file)
-                chunks = self.chunk_document(doc)
-                all_chunks.extend(chunks)
-                print(f"     ✅ Extracted {len(chunks)} chunks\n")
+                chunk_count = 0
+                
+                # Each page's text is stored once; chunks are offsets into it
+                for page in doc["pages"]:
+                    text, spans = self.chunk_spans(page["content"])
+                    categories = [self._categorize_chunk(text[start:end]) for start, end in spans]
+                    store.append_page(doc["source"], page["page_number"], text, spans, categories)
+                    chunk_count += len(spans)
+                
+                print(f"     ✅ Extracted {chunk_count} chunks\n")
             except Exception as e:
                 print(f"     ❌ Error processing {pdf_file.name}: {e}\n")
         
-        # Save processed chunks
-        output_path = Path("data/processed/document_chunks.json")
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+        chunk_count = len(store)
+        store.close()
+        if not chunk_count:
+            print("❌ No chunks extracted - keeping the previous chunk store")
+            shutil.rmtree(build_dir, ignore_errors=True)
+            return ChunkStore(str(output_dir))
         
-        # Convert Pydantic models to dicts for JSON serialization
-        chunks_dict = [chunk.dict() for chunk in all_chunks]
+        self._swap_in(build_dir, output_dir)
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(chunks_dict, f, indent=2, ensure_ascii=False)
+        print(f"✅ Processed {chunk_count} total chunks from {len(pdf_files)} documents")
+        print(f"💾 Saved to: {output_dir}\n")
         
-        print(f"✅ Processed {len(all_chunks)} total chunks from {len(pdf_files)} documents")
-        print(f"💾 Saved to: {output_path}\n")
-        
-        return all_chunks
+        return ChunkStore(str(output_dir))
+    
+    def _swap_in(self, build_dir: Path, output_dir: Path):
+        """Replace output_dir with a finished build (renames only, no copying)"""
+        old_dir = output_dir.with_name(output_dir.name + ".old")
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if output_dir.exists():
+            os.replace(output_dir, old_dir)
+        os.replace(build_dir, output_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
 
 if __name__ == "__main__":
     processor = DocumentProcessor()
@@ -132,7 +165,7 @@ if __name__ == "__main__":
     if chunks:
         categories = {}
         for chunk in chunks:
-            cat = chunk.category.value if chunk.category else "general"
+            cat = chunk.category or "general"
             categories[cat] = categories.get(cat, 0) + 1
         
         print("📊 Chunk Distribution:")
@@ -0,0 +1,245 @@
+# src/escalation_queue.py
+import itertools
+import json
+import os
+import queue
+import threading
+import urllib.request
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+from models import EscalationDecision, EscalationRecord, RetrievedDocument
+
+# Lower drains first, so urgent privacy requests jump the queue
+PRIORITY_ORDER = {"urgent": 0, "high": 1, "medium": 2, "low": 3}
+_STOP = len(PRIORITY_ORDER)
+
+class WebhookConsumer:
+    """Posts each batch of escalations as a JSON array to an HTTP endpoint"""
+
+    def __init__(self, url: str, timeout_s: float = 5.0, headers: Optional[Dict[str, str]] = None):
+        self.url = url
+        self.timeout_s = timeout_s
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+
+    def __call__(self, records: List[EscalationRecord]):
+        body = "[" + ",".join(record.json() for record in records) + "]"
+        request = urllib.request.Request(self.url, data=body.encode('utf-8'), headers=self.headers, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout_s) as response:
+            response.read()
+
+class EscalationSink:
+    """Durable, non-blocking hand-off of escalations to support teams.
+
+    submit() only enqueues, so the request path never waits on disk or
+    network. A background writer drains the queue in priority order, appends
+    each batch to a JSONL log with a single fsync, then hands the batch to
+    the consumers (any callable taking a list of EscalationRecords, e.g. a
+    WebhookConsumer). The log is the source of truth: a batch reaches the
+    consumers only after it is on disk, a failed write is retried with
+    backoff (up to ``max_backoff_s`` apart), and consumer failures are
+    counted but never lose records. close() writes everything queued; only
+    if the log still fails once closing are the remaining records abandoned
+    (and counted).
+    """
+
+    def __init__(
+        self,
+        log_path: str = "data/escalations/escalations.jsonl",
+        consumers: Optional[List[Callable[[List[EscalationRecord]], None]]] = None,
+        batch_size: int = 50,
+        flush_interval_s: float = 0.5,
+        max_queue: int = 10000,
+        max_backoff_s: float = 30.0
+    ):
+        self.log_path = Path(log_path)
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        self.consumers = consumers or []
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.max_backoff_s = max_backoff_s
+
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue(maxsize=max_queue)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._counters = {"enqueued": 0, "written": 0, "dropped": 0, "batches": 0, "write_errors": 0, "consumer_errors": 0, "unwritten": 0, "abandoned": 0}
+        self._depth = {priority: 0 for priority in PRIORITY_ORDER}
+        self._closing = threading.Event()
+
+        self._writer = threading.Thread(target=self._run, name="escalation-writer", daemon=True)
+        self._writer.start()
+
+    def submit(
+        self,
+        query: str,
+        decision: EscalationDecision,
+        retrieved_docs: Optional[List[RetrievedDocument]] = None
+    ) -> bool:
+        """Enqueue an escalation without blocking; returns False if the queue is full"""
+        record = EscalationRecord(
+            escalation_id=uuid.uuid4().hex,
+            query=query,
+            decision=decision,
+            doc_refs=[
+                {"source": doc.source, "page": doc.page, "relevance_score": doc.relevance_score}
+                for doc in retrieved_docs or []
+            ]
+        )
+
+        try:
+            self._queue.put_nowait((PRIORITY_ORDER[decision.priority], next(self._sequence), record))
+        except queue.Full:
+            with self._lock:
+                self._counters["dropped"] += 1
+            print(f"❌ Escalation queue full, dropped {record.escalation_id}")
+            return False
+
+        with self._lock:
+            self._counters["enqueued"] += 1
+            self._depth[decision.priority] += 1
+        return True
+
+    def metrics(self) -> Dict:
+        """Queue depth (total and per priority) plus write and delivery counters"""
+        with self._lock:
+            return {
+                "queue_depth": sum(self._depth.values()),
+                "depth_by_priority": dict(self._depth),
+                **self._counters
+            }
+
+    def flush(self):
+        """Block until everything submitted so far is written (waits out write retries)"""
+        self._queue.join()
+
+    def close(self):
+        """Write what is queued and stop the writer"""
+        self._closing.set()
+        # Wakes the writer early; when the queue is full it stops once drained
+        try:
+            self._queue.put_nowait((_STOP, next(self._sequence), None))
+        except queue.Full:
+            pass
+        self._writer.join()
+
+    def _run(self):
+        # Records whose write failed; retried with backoff before anything new
+        # is taken off the queue, so a full queue pushes back on submit()
+        unwritten: List[EscalationRecord] = []
+        unfinished_items = 0
+        backoff_s = 0.0
+        stop_seen = False
+
+        while True:
+            if unwritten:
+                self._closing.wait(backoff_s)
+            else:
+                if stop_seen:
+                    break
+                try:
+                    items = [self._queue.get(timeout=self.flush_interval_s)]
+                except queue.Empty:
+                    if self._closing.is_set():
+                        break
+                    continue
+
+                # Gather a batch; PriorityQueue already hands items out urgent-first
+                while len(items) < self.batch_size:
+                    try:
+                        items.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                unwritten = [record for _, _, record in items if record is not None]
+                stop_seen = len(unwritten) < len(items)
+                unfinished_items = len(items)
+                with self._lock:
+                    for record in unwritten:
+                        self._depth[record.decision.priority] -= 1
+
+            if unwritten:
+                if self._write(unwritten):
+                    # Only what is on disk goes to consumers
+                    self._deliver(unwritten)
+                    unwritten = []
+                    backoff_s = 0.0
+                elif self._closing.is_set():
+                    # Closing and the log is still failing: give up on the batch
+                    # and on everything still queued behind it
+                    self._abandon(unwritten, unfinished_items)
+                    return
+                else:
+                    backoff_s = min(max(backoff_s * 2, self.flush_interval_s), self.max_backoff_s)
+                    print(f"⏳ Retrying {len(unwritten)} escalations in {backoff_s:.1f}s")
+
+            with self._lock:
+                self._counters["unwritten"] = len(unwritten)
+
+            # flush() returns once the batch is written
+            if not unwritten:
+                for _ in range(unfinished_items):
+                    self._queue.task_done()
+                unfinished_items = 0
+
+    def _abandon(self, records: List[EscalationRecord], unfinished_items: int):
+        abandoned = len(records)
+        while True:
+            try:
+                _, _, record = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            unfinished_items += 1
+            if record is not None:
+                abandoned += 1
+                with self._lock:
+                    self._depth[record.decision.priority] -= 1
+
+        with self._lock:
+            self._counters["abandoned"] += abandoned
+            self._counters["unwritten"] = 0
+        print(f"❌ Stopped with {abandoned} escalations unwritten")
+
+        # Nothing is left to wait for, so flush() must not block
+        for _ in range(unfinished_items):
+            self._queue.task_done()
+
+    def _write(self, records: List[EscalationRecord]) -> bool:
+        data = "".join(record.json() + "\n" for record in records).encode('utf-8')
+
+        # Append-only, one fsync per batch
+        try:
+            with open(self.log_path, 'ab') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            with self._lock:
+                self._counters["write_errors"] += 1
+            print(f"❌ Failed to write {len(records)} escalations: {e}")
+            return False
+
+        with self._lock:
+            self._counters["written"] += len(records)
+            self._counters["batches"] += 1
+        return True
+
+    def _deliver(self, records: List[EscalationRecord]):
+        for consumer in self.consumers:
+            try:
+                consumer(records)
+            except Exception as e:
+                with self._lock:
+                    self._counters["consumer_errors"] += 1
+                print(f"❌ Escalation consumer failed: {e}")
+
+def read_escalation_log(log_path: str = "data/escalations/escalations.jsonl") -> Iterator[EscalationRecord]:
+    """Stream records back from the log, skipping a torn final line after a crash"""
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield EscalationRecord(**json.loads(line))
+            except (json.JSONDecodeError, ValueError):
+                continue
@@ -0,0 +1,235 @@
+# src/evaluation.py
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import json
+import multiprocessing
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent))
+from models import DocumentChunk
+
+def load_labeled_queries(path: str) -> List[Dict]:
+    """Labeled queries, one JSON object per line:
+
+    {"query": "How do I cancel my trial?", "source": "flow_help.pdf", "pages": [12, 13]}
+
+    A retrieved chunk counts as relevant when its source matches and, if
+    ``pages`` is given, its page is one of them.
+    """
+    queries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                record["pages"] = [int(page) for page in record.get("pages", [])]
+                queries.append(record)
+    return queries
+
+def relevance_matrix(retrieved_metadatas: Sequence[List[Dict]], queries: Sequence[Dict], k: int) -> np.ndarray:
+    """Binary (n_queries, k) matrix: is the chunk at rank j relevant to query i"""
+    relevance = np.zeros((len(queries), k), dtype=bool)
+    for i, (metadatas, label) in enumerate(zip(retrieved_metadatas, queries)):
+        for j, metadata in enumerate(metadatas[:k]):
+            relevance[i, j] = metadata["source"] == label["source"] and (
+                not label["pages"] or int(metadata["page"]) in label["pages"]
+            )
+    return relevance
+
+def count_relevant(chunks_per_page: Dict[tuple, int], queries: Sequence[Dict]) -> np.ndarray:
+    """Relevant chunks in the whole corpus per query, from (source, page) chunk counts"""
+    counts = np.zeros(len(queries), dtype=np.int64)
+    for i, label in enumerate(queries):
+        counts[i] = sum(
+            count for (source, page), count in chunks_per_page.items()
+            if source == label["source"] and (not label["pages"] or page in label["pages"])
+        )
+    return counts
+
+def retrieval_metrics(relevance: np.ndarray, n_relevant: Optional[np.ndarray] = None) -> Dict[str, float]:
+    """recall@k, hit rate, MRR and nDCG@k over a binary relevance matrix.
+
+    ``n_relevant`` is each query's number of relevant chunks in the corpus;
+    without it recall and the ideal DCG only count the relevant chunks
+    retrieved (so recall degrades to hit rate).
+    """
+    n_queries, k = relevance.shape
+    if n_queries == 0:
+        return {"recall": 0.0, "hit_rate": 0.0, "mrr": 0.0, "ndcg": 0.0}
+
+    hits = relevance.any(axis=1)
+    first_hit = relevance.argmax(axis=1)
+    reciprocal_rank = np.where(hits, 1.0 / (first_hit + 1), 0.0)
+
+    # Binary gains; the ideal ranking fills the top k with relevant chunks
+    if n_relevant is None:
+        n_relevant = relevance.sum(axis=1)
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    dcg = (relevance * discounts).sum(axis=1)
+    ideal = np.cumsum(discounts)[np.clip(n_relevant, 1, k) - 1]
+    ndcg = np.where(hits, dcg / ideal, 0.0)
+
+    # Share of the relevant chunks that fit in the top k that were retrieved
+    retrievable = np.minimum(n_relevant, k)
+    recall = np.divide(relevance.sum(axis=1), retrievable, out=np.zeros(n_queries), where=retrievable > 0)
+
+    return {
+        "recall": float(recall.mean()),
+        "hit_rate": float(hits.mean()),
+        "mrr": float(reciprocal_rank.mean()),
+        "ndcg": float(ndcg.mean())
+    }
+
+def _directory_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+def evaluate_config(documents: List[Dict], queries: List[Dict], chunk_size: int, overlap: int, k_values: List[int]) -> List[Dict]:
+    """Build a temporary index for one chunking config and score it at each k"""
+    from data_processing import DocumentProcessor
+    from prompts import PromptBuilder, estimate_tokens
+    from vector_store import VectorStore
+
+    processor = DocumentProcessor()
+    builder = PromptBuilder()
+    index_dir = Path(tempfile.mkdtemp(prefix="flow_eval_"))
+
+    try:
+        store = VectorStore(persist_directory=str(index_dir))
+
+        chunks_per_page: Counter = Counter()
+
+        def chunks():
+            chunk_id = 0
+            for doc in documents:
+                for page in doc["pages"]:
+                    text, spans = processor.chunk_spans(page["content"], chunk_size, overlap)
+                    chunks_per_page[(doc["source"], page["page_number"])] += len(spans)
+                    for start, end in spans:
+                        yield DocumentChunk(
+                            text=text[start:end],
+                            source=doc["source"],
+                            page=page["page_number"],
+                            chunk_id=chunk_id
+                        )
+                        chunk_id += 1
+
+        store.load_documents(chunks())
+        chunk_count = store.collection.count()
+        index_bytes = _directory_bytes(index_dir)
+
+        max_k = max(k_values)
+        results = []
+        latencies_ms = []
+        for query in queries:
+            start_time = time.perf_counter()
+            results.append(store.search(query["query"], n_results=max_k))
+            latencies_ms.append((time.perf_counter() - start_time) * 1000)
+
+        relevance = relevance_matrix([r["metadatas"] for r in results], queries, max_k)
+        n_relevant = count_relevant(chunks_per_page, queries)
+
+        rows = []
+        for k in k_values:
+            context_tokens = [
+                estimate_tokens("\n".join(
+                    builder.document(i, meta["source"], meta["page"], doc)
+                    for i, (doc, meta) in enumerate(zip(r["documents"][:k], r["metadatas"][:k]), 1)
+                ))
+                for r in results
+            ]
+            rows.append({
+                "chunk_size": chunk_size,
+                "overlap": overlap,
+                "k": k,
+                **{f"{name}@k": value for name, value in retrieval_metrics(relevance[:, :k], n_relevant).items()},
+                "chunks": chunk_count,
+                "index_mb": round(index_bytes / 1024 / 1024, 2),
+                "p50_latency_ms": round(float(np.percentile(latencies_ms, 50)), 1),
+                "p95_latency_ms": round(float(np.percentile(latencies_ms, 95)), 1),
+                "avg_context_tokens": int(np.mean(context_tokens))
+            })
+        return rows
+    finally:
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+def sweep(
+    documents: List[Dict],
+    queries: List[Dict],
+    chunk_sizes: List[int],
+    overlaps: List[int],
+    k_values: List[int],
+    workers: int = 2
+) -> pd.DataFrame:
+    """Evaluate every chunk_size x overlap config in parallel worker processes"""
+    configs = [(size, overlap) for size, overlap in itertools.product(chunk_sizes, overlaps) if overlap < size]
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [
+            pool.submit(evaluate_config, documents, queries, size, overlap, k_values)
+            for size, overlap in configs
+        ]
+        rows = [row for future in futures for row in future.result()]
+
+    return pd.DataFrame(rows)
+
+def pick_cheapest(report: pd.DataFrame, min_recall: float, min_mrr: float = 0.0):
+    """Cheapest config (context tokens, then index size, then latency) meeting the quality bar"""
+    passing = report[(report["recall@k"] >= min_recall) & (report["mrr@k"] >= min_mrr)]
+    if passing.empty:
+        return None
+    return passing.sort_values(["avg_context_tokens", "index_mb", "p50_latency_ms"]).iloc[0]
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",")]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep chunking and k against a labeled query set")
+    parser.add_argument("queries", help="JSONL file of labeled queries")
+    parser.add_argument("--data-dir", default="data/raw", help="Directory of source PDFs")
+    parser.add_argument("--chunk-sizes", type=_int_list, default=[300, 500, 800])
+    parser.add_argument("--overlaps", type=_int_list, default=[0, 50, 100])
+    parser.add_argument("--k", type=_int_list, default=[3, 5, 8])
+    parser.add_argument("--min-recall", type=float, default=0.8)
+    parser.add_argument("--min-mrr", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--output", default="data/eval/retrieval_sweep.csv")
+    args = parser.parse_args()
+
+    from data_processing import DocumentProcessor
+
+    queries = load_labeled_queries(args.queries)
+    processor = DocumentProcessor(args.data_dir)
+    documents = [processor.extract_pdf_text(pdf) for pdf in sorted(Path(args.data_dir).glob("*.pdf"))]
+
+    if not documents or not queries:
+        print("❌ Need at least one PDF and one labeled query")
+        exit(1)
+
+    print(f"\n🧪 Evaluating {len(queries)} queries against {len(documents)} documents...\n")
+    report = sweep(documents, queries, args.chunk_sizes, args.overlaps, args.k, args.workers)
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    report.to_csv(args.output, index=False)
+
+    print(report.sort_values(["recall@k", "avg_context_tokens"], ascending=[False, True]).to_string(index=False))
+    print(f"\n💾 Saved to: {args.output}")
+
+    best = pick_cheapest(report, args.min_recall, args.min_mrr)
+    if best is None:
+        print(f"\n❌ No configuration reaches recall@k >= {args.min_recall:.0%}")
+    else:
+        print(
+            f"\n✅ Cheapest passing config: chunk_size={best['chunk_size']}, overlap={best['overlap']}, "
+            f"k={best['k']} (recall {best['recall@k']:.0%}, MRR {best['mrr@k']:.2f}, "
+            f"~{best['avg_context_tokens']} context tokens)"
+        )
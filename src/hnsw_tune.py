@@ -0,0 +1,162 @@
+# src/hnsw_tune.py
+import argparse
+import itertools
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import sys
+
+import chromadb
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent))
+from models import HNSWConfig
+from vector_store import save_hnsw_config
+
+def load_queries(path: str, field: str = "query") -> List[str]:
+    """Sample queries from a JSONL file (``field`` of each object) or plain text, one per line"""
+    queries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            queries.append(json.loads(line)[field] if line.startswith("{") else line)
+    return queries
+
+def exact_neighbors(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Ground-truth top-k row indices by brute-force cosine similarity"""
+    corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    similarity = queries @ corpus.T
+    top = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(similarity, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+def _directory_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+def measure_config(
+    config: HNSWConfig,
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    k: int,
+    batch_size: int = 1000
+) -> Dict:
+    """Build a throwaway index with ``config`` and measure recall@k, latency and size"""
+    index_dir = Path(tempfile.mkdtemp(prefix="flow_hnsw_"))
+    try:
+        client = chromadb.PersistentClient(path=str(index_dir))
+        collection = client.create_collection(name="hnsw_tune", metadata=config.collection_metadata())
+
+        # Embeddings are computed once up front, so builds only pay for HNSW
+        start_time = time.perf_counter()
+        for start in range(0, len(corpus), batch_size):
+            rows = corpus[start:start + batch_size]
+            collection.add(
+                ids=[str(i) for i in range(start, start + len(rows))],
+                embeddings=rows.tolist()
+            )
+        build_s = time.perf_counter() - start_time
+
+        latencies_ms = []
+        hits = 0
+        for query, expected in zip(queries, truth):
+            start_time = time.perf_counter()
+            results = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+            latencies_ms.append((time.perf_counter() - start_time) * 1000)
+            hits += len(set(int(i) for i in results["ids"][0]) & set(expected.tolist()))
+
+        index_bytes = _directory_bytes(index_dir)
+        del collection, client
+
+        return {
+            **config.dict(),
+            f"recall@{k}": round(hits / truth.size, 4),
+            "p50_latency_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+            "p95_latency_ms": round(float(np.percentile(latencies_ms, 95)), 2),
+            "build_s": round(build_s, 2),
+            "index_mb": round(index_bytes / 1024 / 1024, 2)
+        }
+    finally:
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+def tune(
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    k: int = 5,
+    m_values: List[int] = (8, 16, 32),
+    construction_efs: List[int] = (100, 200),
+    search_efs: List[int] = (10, 50, 100)
+) -> pd.DataFrame:
+    """Measure every M x construction_ef x search_ef combination in cosine space"""
+    truth = exact_neighbors(corpus, queries, k)
+    rows = []
+    for m, construction_ef, search_ef in itertools.product(m_values, construction_efs, search_efs):
+        config = HNSWConfig(M=m, construction_ef=construction_ef, search_ef=search_ef)
+        print(f"  ⚙️  M={m} construction_ef={construction_ef} search_ef={search_ef}")
+        rows.append(measure_config(config, corpus, queries, truth, k))
+    return pd.DataFrame(rows)
+
+def pick_config(report: pd.DataFrame, k: int, min_recall: float) -> Optional[HNSWConfig]:
+    """Fastest config (p95 latency, then index size) that reaches ``min_recall``"""
+    passing = report[report[f"recall@{k}"] >= min_recall]
+    if passing.empty:
+        return None
+    best = passing.sort_values(["p95_latency_ms", "index_mb"]).iloc[0]
+    return HNSWConfig(M=int(best["M"]), construction_ef=int(best["construction_ef"]), search_ef=int(best["search_ef"]))
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",")]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune HNSW parameters for recall vs. latency and index size")
+    parser.add_argument("queries", help="Sample queries: JSONL (see --field) or one per line")
+    parser.add_argument("--chunk-store", default="data/processed/chunk_store")
+    parser.add_argument("--persist-directory", default="./chroma_db", help="Where hnsw_config.json is written")
+    parser.add_argument("--field", default="query")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--m", type=_int_list, default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=_int_list, default=[100, 200])
+    parser.add_argument("--search-ef", type=_int_list, default=[10, 50, 100])
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    parser.add_argument("--output", default="data/eval/hnsw_sweep.csv")
+    parser.add_argument("--dry-run", action="store_true", help="Report only, don't write the config")
+    args = parser.parse_args()
+
+    from chromadb.utils import embedding_functions
+    from chunk_store import ChunkStore
+
+    store = ChunkStore(args.chunk_store)
+    queries = load_queries(args.queries, args.field)
+    if not len(store) or not queries:
+        print("❌ Need a non-empty chunk store and at least one query")
+        exit(1)
+
+    embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
+    print(f"\n🔢 Embedding {len(store)} chunks and {len(queries)} queries...")
+    corpus = np.array(embedding_function([chunk.text for chunk in store]), dtype=np.float32)
+    query_vectors = np.array(embedding_function(queries), dtype=np.float32)
+
+    print("\n🧪 Sweeping HNSW parameters...")
+    report = tune(corpus, query_vectors, args.k, args.m, args.construction_ef, args.search_ef)
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    report.to_csv(args.output, index=False)
+    print("\n" + report.to_string(index=False))
+    print(f"\n💾 Saved to: {args.output}")
+
+    best = pick_config(report, args.k, args.min_recall)
+    if best is None:
+        print(f"\n❌ No configuration reaches recall@{args.k} >= {args.min_recall:.0%}")
+        exit(1)
+
+    print(f"\n✅ Chosen: M={best.M}, construction_ef={best.construction_ef}, search_ef={best.search_ef}")
+    if not args.dry_run:
+        path = save_hnsw_config(args.persist_directory, best)
+        print(f"💾 Wrote {path} - rebuild the index to apply it: python src/vector_store.py")
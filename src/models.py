@@ -1,6 +1,6 @@
 # src/models.py
 from pydantic import BaseModel, Field, validator
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal
 from datetime import datetime
 from enum import Enum
 
@@ -33,6 +33,7 @@ class RetrievedDocument(BaseModel):
     source: str
     page: str
     relevance_score: float = Field(..., ge=0.0, le=1.0)
+    chunk_id: Optional[int] = None
     
     @validator('relevance_score')
     def score_precision(cls, v):
@@ -55,6 +56,10 @@ class AgentResponse(BaseModel):
     confidence: ConfidenceLevel
     avg_relevance_score: float = Field(..., ge=0.0, le=1.0)
     processing_time_ms: int
+    queue_time_ms: int = 0
+    prompt_tokens: Dict[str, int] = Field(default_factory=dict)
+    stage_timings_ms: Dict[str, int] = Field(default_factory=dict)
+    llm_error: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     
     class Config:
@@ -62,3 +67,47 @@ class AgentResponse(BaseModel):
         json_encoders = {
             datetime: lambda v: v.isoformat()
         }
+
+class EscalationRecord(BaseModel):
+    """Escalation handed off to a support team"""
+    escalation_id: str
+    query: str
+    decision: EscalationDecision
+    doc_refs: List[Dict] = Field(default_factory=list)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Config:
+        use_enum_values = True
+        json_encoders = {
+            datetime: lambda v: v.isoformat()
+        }
+
+class TenantMetrics(BaseModel):
+    """Load and eviction counters for one tenant knowledge base"""
+    tenant_id: str
+    resident: bool = False
+    loads: int = 0
+    evictions: int = 0
+    hits: int = 0
+    chunks: int = 0
+    estimated_bytes: int = 0
+    last_load_ms: int = 0
+    last_access: Optional[datetime] = None
+
+class HNSWConfig(BaseModel):
+    """Distance space and HNSW index parameters for Chroma collections"""
+    space: Literal["cosine", "l2", "ip"] = "cosine"
+    M: int = Field(16, gt=0)
+    construction_ef: int = Field(100, gt=0)
+    # Unset unless tuned (see hnsw_tune.py), so Chroma's own default applies
+    search_ef: Optional[int] = Field(None, gt=0)
+    
+    def collection_metadata(self) -> Dict:
+        metadata = {
+            "hnsw:space": self.space,
+            "hnsw:M": self.M,
+            "hnsw:construction_ef": self.construction_ef
+        }
+        if self.search_ef is not None:
+            metadata["hnsw:search_ef"] = self.search_ef
+        return metadata
@@ -0,0 +1,160 @@
+# src/profiling.py
+import cProfile
+import functools
+import io
+import os
+import pstats
+import random
+import threading
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+class Profiler:
+    """On-demand profiling hooks for live workers.
+
+    - ``sampled(label)`` runs a configurable fraction of calls under cProfile
+      and aggregates them per label into pstats.
+    - ``track_memory(label)`` takes tracemalloc snapshots before and after a
+      call and keeps the top allocation diffs. Snapshots are process-wide, so
+      concurrent work in other threads shows up in the diff.
+
+    Both are off by default and cost one attribute check per call when off.
+    Switch them with FLOWSUPPORT_PROFILE_SAMPLE_RATE / FLOWSUPPORT_TRACE_MEMORY
+    (read at startup or via refresh_from_env) or at runtime with configure().
+    """
+
+    def __init__(self, sample_rate: float = 0.0, trace_memory: bool = False, top_n: int = 10):
+        self.sample_rate = 0.0
+        self.trace_memory = False
+        self.top_n = top_n
+
+        self._stats: Dict[str, pstats.Stats] = {}
+        self._samples: Dict[str, int] = {}
+        self._memory: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        # cProfile can only profile one call at a time; others run unprofiled
+        self._profiling = threading.Lock()
+
+        self.configure(sample_rate=sample_rate, trace_memory=trace_memory)
+
+    @classmethod
+    def from_env(cls) -> "Profiler":
+        profiler = cls()
+        profiler.refresh_from_env()
+        return profiler
+
+    def refresh_from_env(self):
+        """Re-read the profiling switches from the environment"""
+        self.configure(
+            sample_rate=float(os.getenv("FLOWSUPPORT_PROFILE_SAMPLE_RATE", "0") or 0),
+            trace_memory=os.getenv("FLOWSUPPORT_TRACE_MEMORY", "").lower() in ("1", "true", "yes")
+        )
+
+    def configure(self, sample_rate: Optional[float] = None, trace_memory: Optional[bool] = None):
+        """Admin switch: change the cProfile sample rate and/or memory tracing"""
+        if sample_rate is not None:
+            self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+
+        if trace_memory is not None:
+            if trace_memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            elif not trace_memory and self.trace_memory and tracemalloc.is_tracing():
+                tracemalloc.stop()
+            self.trace_memory = trace_memory
+
+    def sampled(self, label: str) -> Callable:
+        """Decorator: profile a sample of calls with cProfile under ``label``"""
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.sample_rate or random.random() >= self.sample_rate:
+                    return func(*args, **kwargs)
+                if not self._profiling.acquire(blocking=False):
+                    return func(*args, **kwargs)
+
+                profile = cProfile.Profile()
+                try:
+                    return profile.runcall(func, *args, **kwargs)
+                finally:
+                    self._profiling.release()
+                    self._add_profile(label, profile)
+            return wrapper
+        return decorator
+
+    def track_memory(self, label: str) -> Callable:
+        """Decorator: record a tracemalloc diff around each call under ``label``"""
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.trace_memory:
+                    return func(*args, **kwargs)
+
+                before = tracemalloc.take_snapshot()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    # Tracing may have been switched off mid-call
+                    if tracemalloc.is_tracing():
+                        after = tracemalloc.take_snapshot()
+                        self._add_memory_diff(label, after.compare_to(before, "lineno"))
+            return wrapper
+        return decorator
+
+    def report(self, label: str, sort_by: str = "cumulative", limit: int = 20) -> str:
+        """Aggregated cProfile stats for one label as text"""
+        with self._lock:
+            if label not in self._stats:
+                return f"No samples for {label}"
+
+            stream = io.StringIO()
+            stream.write(f"{label}: {self._samples[label]} sampled calls\n")
+            stats = self._stats[label]
+            stats.stream = stream
+            stats.sort_stats(sort_by).print_stats(limit)
+            return stream.getvalue()
+
+    def dump_stats(self, directory: str = "data/profiles") -> List[Path]:
+        """Write each label's aggregated stats to <label>.prof (for snakeviz, pstats, ...)"""
+        output_dir = Path(directory)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        paths = []
+        with self._lock:
+            for label, stats in self._stats.items():
+                path = output_dir / f"{label}.prof"
+                stats.dump_stats(str(path))
+                paths.append(path)
+        return paths
+
+    def memory_report(self) -> Dict[str, Dict]:
+        """Latest tracemalloc diff per label"""
+        with self._lock:
+            return {label: dict(diff) for label, diff in self._memory.items()}
+
+    def reset(self):
+        """Drop all collected samples and snapshots"""
+        with self._lock:
+            self._stats.clear()
+            self._samples.clear()
+            self._memory.clear()
+
+    def _add_profile(self, label: str, profile: cProfile.Profile):
+        with self._lock:
+            if label in self._stats:
+                self._stats[label].add(profile)
+            else:
+                self._stats[label] = pstats.Stats(profile)
+            self._samples[label] = self._samples.get(label, 0) + 1
+
+    def _add_memory_diff(self, label: str, diff: List[tracemalloc.StatisticDiff]):
+        with self._lock:
+            self._memory[label] = {
+                "taken_at": datetime.utcnow().isoformat(),
+                "net_bytes": sum(stat.size_diff for stat in diff),
+                "top": [str(stat) for stat in diff[:self.top_n]]
+            }
+
+# Shared by the agent, vector store and ingestion pipeline
+profiler = Profiler.from_env()
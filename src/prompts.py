@@ -0,0 +1,213 @@
+# src/prompts.py
+import google.generativeai as genai
+from datetime import timedelta
+import hashlib
+from string import Template
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+from models import EscalationDecision
+
+# Static instructions: sent once as the model's system instruction (and
+# cacheable prefix) instead of being rebuilt into every request
+SYSTEM_INSTRUCTION = """You are FlowSupport AI, a helpful customer success agent for Wispr Flow.
+
+Your role:
+- Answer questions using ONLY the provided documentation
+- BE CONCISE and natural - like helping a colleague
+- For installation issues: ALWAYS check system requirements FIRST
+- For troubleshooting: Provide specific solutions
+- Match Wispr Flow's voice: professional but approachable
+
+Installation Issue Protocol:
+When user says Flow "won't install" or "can't install":
+1. **FIRST:** State minimum requirements for their device
+2. **THEN:** Ask if they meet these requirements  
+3. **ONLY IF they meet requirements:** Provide troubleshooting steps
+
+System Requirements (memorize these):
+- Mac: macOS 12.0+, 500MB space, microphone, internet
+- Windows: Windows 10 64-bit+, Intel i3/Ryzen 3+, 4GB RAM (8GB rec), 500MB space, microphone, internet
+- iPhone: iOS 18.3+, 500MB space, internet
+
+Example Installation Response:
+❌ BAD: "Try these 10 troubleshooting steps..." [too long, skips requirements]
+✅ GOOD: "Flow requires iOS 18.3+ and 500MB free space. Check Settings → General → About for your iOS version. If below 18.3, update iOS first. Let me know if you meet these!"
+
+Conversation Style:
+- Keep responses under 100 words for requirements checks
+- Keep other responses under 150 words
+- Give COMPLETE answers with clear next steps
+- End naturally: "Hope that helps!", "Let me know if you need anything else!"
+- Never ask "Does that answer your question?"
+- Be warm and human, not robotic
+
+Guidelines:
+- Don't make up information
+- Check requirements BEFORE troubleshooting
+- Be helpful and complete
+- End warmly and naturally
+
+Response Instructions:
+1. Identify if this is an INSTALLATION or SETUP issue
+2. If installation: START with system requirements check (under 100 words)
+3. Ask user to verify requirements BEFORE providing other troubleshooting
+4. If NOT installation: provide complete answer (under 150 words)
+5. End naturally: "Let me know if that works!" or "Hope that helps!"
+
+Provide a helpful, accurate, COMPLETE response."""
+
+REQUIREMENTS_HEADER = """[CRITICAL - CHECK SYSTEM REQUIREMENTS FIRST]
+
+System Requirements:
+- Mac: macOS 12.0 or newer, 500MB free space, microphone, internet
+- Windows: Windows 10 (64-bit) or later, Intel i3/AMD Ryzen 3+, 4GB RAM (8GB recommended), 500MB space, microphone, internet  
+- iPhone: iOS 18.3 or newer, 500MB free space, internet
+
+ALWAYS verify user meets minimum requirements BEFORE providing troubleshooting steps.
+---
+
+"""
+
+DEVICE_CLARIFICATION = """I can help with that! To give you the most accurate solution, could you let me know which device you're using?
+
+- **Mac** (macOS)
+- **Windows** (PC)
+- **iPhone** (iOS)
+
+Just let me know and I'll provide specific instructions for your device!"""
+
+# Templates compiled once at import; only the dynamic parts are filled per request
+USER_TEMPLATE = Template("""User Question: $query
+
+Relevant Documentation:
+$context""")
+
+DOCUMENT_TEMPLATE = Template("[Document $index] (Source: $source, Page: $page)\n$content\n")
+
+ESCALATION_TEMPLATE = Template("""I'd like to connect you with our support team for personalized assistance.
+
+**Why:** $reason
+**Team:** $team
+**Priority:** $priority
+
+You can reach support at: support@useflow.ai""")
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 characters per token)"""
+    return (len(text) + 3) // 4
+
+class PromptBuilder:
+    """Assembles per-request prompts around a fixed system instruction.
+
+    The system instruction is counted once; each request only fills the
+    precompiled templates and counts its own dynamic tokens.
+    """
+
+    def __init__(
+        self,
+        system_instruction: str = SYSTEM_INSTRUCTION,
+        count_tokens: Callable[[str], int] = estimate_tokens
+    ):
+        self.system_instruction = system_instruction
+        self.count_tokens = count_tokens
+        self.system_tokens = count_tokens(system_instruction)
+
+    def document(self, index: int, source: str, page, content: str) -> str:
+        return DOCUMENT_TEMPLATE.substitute(index=index, source=source, page=page, content=content)
+
+    def user_prompt(self, query: str, context: str) -> str:
+        return USER_TEMPLATE.substitute(query=query, context=context)
+
+    def escalation_reply(self, escalation: EscalationDecision) -> str:
+        return ESCALATION_TEMPLATE.substitute(
+            reason=escalation.reason,
+            team=escalation.suggested_team or 'General Support',
+            priority=escalation.priority
+        )
+
+    def token_counts(self, user_prompt: str) -> Dict[str, int]:
+        """Input tokens per prompt part"""
+        user_tokens = self.count_tokens(user_prompt)
+        return {
+            "system": self.system_tokens,
+            "user": user_tokens,
+            "total": self.system_tokens + user_tokens
+        }
+
+class LocalPrefixCache:
+    """Builds one model per distinct system prefix and reuses it.
+
+    Stand-in for provider-side context caching (e.g. in tests): it only
+    avoids rebuilding the model and tracks hits and misses. Callers should
+    ask model_for() on every request rather than holding on to the model,
+    so subclasses can replace entries that expire.
+    """
+
+    def __init__(self, model_factory: Callable[[str], object]):
+        self.model_factory = model_factory
+        self.hits = 0
+        self.misses = 0
+        self._models: Dict[str, Tuple[object, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def model_for(self, system_instruction: str):
+        key = hashlib.sha256(system_instruction.encode('utf-8')).hexdigest()
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None and (entry[1] is None or time.time() < entry[1]):
+                self.hits += 1
+                return entry[0]
+
+            self.misses += 1
+            self._models[key] = self._build(system_instruction)
+            return self._models[key][0]
+
+    def _build(self, system_instruction: str) -> Tuple[object, Optional[float]]:
+        """(model, expiry timestamp or None if it never expires)"""
+        return self.model_factory(system_instruction), None
+
+class GeminiPrefixCache(LocalPrefixCache):
+    """Serves the system prefix from Gemini context caching.
+
+    The prefix is uploaded once as cached content and requests reference it,
+    so its tokens are neither resent nor billed at the full input rate. The
+    cached content is recreated ``refresh_margin`` before its TTL lapses, so
+    requests never reference expired content.
+
+    Gemini only caches prefixes above a minimum size (thousands of tokens)
+    on models that support caching. Today's SYSTEM_INSTRUCTION is a few
+    hundred tokens, so this always falls back to a plain system instruction
+    and saves nothing per request; it pays off only once the static prefix
+    grows past that minimum (e.g. if reference material moves into it).
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        ttl: timedelta = timedelta(hours=1),
+        refresh_margin: timedelta = timedelta(minutes=5)
+    ):
+        super().__init__(lambda instruction: genai.GenerativeModel(model_name, system_instruction=instruction))
+        self.model_name = model_name
+        self.ttl = ttl
+        self.refresh_margin = min(refresh_margin, ttl / 2)
+
+    def _build(self, system_instruction: str) -> Tuple[object, Optional[float]]:
+        try:
+            from google.generativeai import caching
+
+            cached_content = caching.CachedContent.create(
+                model=self.model_name,
+                system_instruction=system_instruction,
+                ttl=self.ttl
+            )
+            expires_at = time.time() + (self.ttl - self.refresh_margin).total_seconds()
+            return genai.GenerativeModel.from_cached_content(cached_content), expires_at
+        except Exception as e:
+            print(f"⚠️  Context caching unavailable, using system instruction: {e}")
+            return super()._build(system_instruction)
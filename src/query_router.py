@@ -0,0 +1,59 @@
+# src/query_router.py
+from pathlib import Path
+from typing import Dict, List, Tuple
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+from models import QueryCategory
+
+# Keyword rules shared by chunk categorization and query routing.
+# Order matters: the first matching category wins in categorize_text.
+CATEGORY_KEYWORDS: Dict[QueryCategory, List[str]] = {
+    QueryCategory.BILLING: ["trial", "subscription", "pricing", "billing", "payment", "upgrade", "pro plan", "cancel"],
+    QueryCategory.TECHNICAL: ["troubleshoot", "error", "not working", "issue", "fix", "desktop", "ios", "install"],
+    QueryCategory.ACCOUNT: ["account", "sign up", "login", "password", "delete"],
+    QueryCategory.PRODUCT: ["feature", "use case", "workflow", "app", "integration", "dictation"],
+}
+
+# Pseudo-count of "unroutable" hits added to every query, so one stray keyword
+# can't score a confident route: 1 hit scores 0.33, 2 hits in one category 0.5
+ROUTE_PRIOR_HITS = 2
+
+def categorize_text(text: str) -> QueryCategory:
+    """Categorize text using the first matching keyword rule"""
+    text_lower = text.lower()
+
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if any(word in text_lower for word in keywords):
+            return category
+
+    return QueryCategory.GENERAL
+
+def matching_categories(text: str) -> List[QueryCategory]:
+    """Every category with a keyword match, in rule order (GENERAL if none)"""
+    text_lower = text.lower()
+    matches = [
+        category for category, keywords in CATEGORY_KEYWORDS.items()
+        if any(word in text_lower for word in keywords)
+    ]
+    return matches or [QueryCategory.GENERAL]
+
+def route_query(query: str) -> List[Tuple[QueryCategory, float]]:
+    """Score each category by keyword hits, best first.
+
+    Scores are hits / (total hits + ROUTE_PRIOR_HITS), so they need both
+    several matches and a clear margin over other categories to get high.
+    An empty list means no rule matched and the query cannot be routed.
+    """
+    query_lower = query.lower()
+
+    hits = {
+        category: sum(1 for word in keywords if word in query_lower)
+        for category, keywords in CATEGORY_KEYWORDS.items()
+    }
+    total = sum(hits.values())
+    if total == 0:
+        return []
+
+    scores = [(category, count / (total + ROUTE_PRIOR_HITS)) for category, count in hits.items() if count > 0]
+    return sorted(scores, key=lambda item: item[1], reverse=True)
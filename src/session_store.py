@@ -0,0 +1,94 @@
+# src/session_store.py
+import itertools
+import json
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+_SESSION_ID = re.compile(r"^[a-zA-Z0-9_-]+$")
+
+class SessionHistoryStore:
+    """Server-side overflow for chat histories.
+
+    The UI keeps only the most recent messages in session state and appends
+    older ones here, one JSONL file per session, so session memory stays
+    bounded however long a conversation runs.
+
+    Streamlit gives no reliable signal when a session ends, so archives are
+    cleaned up by age and total size instead: at most every
+    ``cleanup_interval_s``, files untouched for ``max_age_s`` are removed,
+    then the least recently written ones until the directory fits in
+    ``max_total_bytes``.
+    """
+
+    def __init__(
+        self,
+        directory: str = "data/sessions",
+        max_age_s: float = 7 * 24 * 3600,
+        max_total_bytes: int = 512 * 1024 * 1024,
+        cleanup_interval_s: float = 600.0
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_age_s = max_age_s
+        self.max_total_bytes = max_total_bytes
+        self.cleanup_interval_s = cleanup_interval_s
+
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+        self.cleanup()
+
+    def append(self, session_id: str, messages: List[Dict]):
+        """Archive messages for a session, oldest first"""
+        with open(self._path(session_id), 'a', encoding='utf-8') as f:
+            for message in messages:
+                f.write(json.dumps(message, ensure_ascii=False) + "\n")
+
+        if time.time() - self._last_cleanup >= self.cleanup_interval_s:
+            self.cleanup()
+
+    def read(self, session_id: str, start: int, end: int) -> List[Dict]:
+        """Archived messages [start, end) of a session"""
+        path = self._path(session_id)
+        if not path.exists():
+            return []
+
+        with open(path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in itertools.islice(f, start, end)]
+
+    def delete(self, session_id: str):
+        path = self._path(session_id)
+        if path.exists():
+            path.unlink()
+
+    def cleanup(self) -> int:
+        """Remove expired archives, then the oldest until under the size budget"""
+        with self._lock:
+            self._last_cleanup = time.time()
+            cutoff = self._last_cleanup - self.max_age_s
+
+            files = []
+            for path in self.directory.glob("*.jsonl"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+            files.sort()
+
+            total_bytes = sum(size for _, size, _ in files)
+            removed = 0
+            for mtime, size, path in files:
+                if mtime >= cutoff and total_bytes <= self.max_total_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total_bytes -= size
+                removed += 1
+            return removed
+
+    def _path(self, session_id: str) -> Path:
+        if not _SESSION_ID.match(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        return self.directory / f"{session_id}.jsonl"
@@ -0,0 +1,343 @@
+# src/sharded_store.py
+import heapq
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import sys
+
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+from chromadb.utils import embedding_functions
+
+sys.path.insert(0, str(Path(__file__).parent))
+from models import DocumentChunk, HNSWConfig
+from chunk_store import ChunkStore
+from vector_store import _EMBEDDING_LOCK, load_hnsw_config
+
+def _shard_worker(persist_directory: str, conn, search_threads: int, hnsw: HNSWConfig):
+    """Worker process: owns one VectorStore and answers requests over a pipe.
+
+    Searches run on a small thread pool so concurrent queries overlap; loads
+    and clears run inline, in the order they arrive. Vectors are computed by
+    the parent, so the worker never loads an embedding model.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from vector_store import VectorStore
+
+    store = VectorStore(persist_directory=persist_directory, hnsw=hnsw, precomputed_embeddings=True)
+    send_lock = threading.Lock()
+
+    def reply(request_id, status, result):
+        with send_lock:
+            conn.send((request_id, status, result))
+
+    def run(request_id, op, payload):
+        try:
+            if op == "load":
+                chunks, embeddings = payload
+                store.load_documents(chunks, embeddings=list(embeddings))
+                result = len(chunks)
+            elif op == "search":
+                query, query_embeddings, n_results, source = payload
+                result = store.search(query, n_results, source, query_embeddings=list(query_embeddings))
+            elif op == "count":
+                result = store.collection.count()
+            elif op == "clear":
+                store.clear()
+                result = None
+            else:
+                raise ValueError(f"Unknown shard operation: {op}")
+            reply(request_id, "ok", result)
+        except Exception as e:
+            reply(request_id, "error", repr(e))
+
+    reply(None, "ok", "ready")
+
+    with ThreadPoolExecutor(max_workers=search_threads) as pool:
+        while True:
+            try:
+                request_id, op, payload = conn.recv()
+            except (EOFError, KeyboardInterrupt):
+                break
+
+            if op == "stop":
+                break
+            if op in ("search", "count"):
+                pool.submit(run, request_id, op, payload)
+            else:
+                run(request_id, op, payload)
+
+    conn.close()
+
+class ShardedVectorStore:
+    """Vector search sharded across local worker processes.
+
+    Chunks are hash-partitioned by chunk_id across ``num_shards`` processes,
+    each holding its own Chroma index under ``<persist_directory>/shard_<i>``.
+    The parent embeds chunks and queries once with a single model; searches
+    fan out the query vector to every shard in parallel and the per-shard
+    top-k lists are merged with a heap. Every shard uses the index settings
+    in ``<persist_directory>/hnsw_config.json`` (see hnsw_tune.py). Shards that miss ``shard_timeout_s``
+    are skipped and the result is marked partial.
+
+    Requests are tagged with ids and one reader thread per pipe routes each
+    reply to its waiting caller, so concurrent searches overlap instead of
+    taking turns.
+
+    Exposes the same load_documents/search/clear interface as VectorStore.
+    """
+
+    def __init__(
+        self,
+        persist_directory: str = "./chroma_db_shards",
+        num_shards: int = 4,
+        shard_timeout_s: float = 2.0,
+        startup_timeout_s: float = 120.0,
+        search_threads: int = 4,
+        embedding_function: Optional[EmbeddingFunction] = None,
+        hnsw: Optional[HNSWConfig] = None
+    ):
+        self.num_shards = num_shards
+        self.shard_timeout_s = shard_timeout_s
+
+        # One embedding model for every shard
+        self.embedding_function = embedding_function or embedding_functions.SentenceTransformerEmbeddingFunction(
+            model_name="all-MiniLM-L6-v2"
+        )
+
+        # Tuned settings live at the top level, not in each shard's directory
+        self.hnsw = hnsw or load_hnsw_config(persist_directory)
+
+        print(f"🔧 Starting {num_shards} shard workers...")
+
+        # request_id -> queue of (shard, status, result) replies
+        self._pending: Dict[Optional[int], "queue.Queue"] = {None: queue.Queue()}
+        self._pending_lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._alive = [True] * num_shards
+        self._closing = False
+        self._send_locks = [threading.Lock() for _ in range(num_shards)]
+
+        context = multiprocessing.get_context("spawn")
+        self._processes = []
+        self._conns = []
+        for i in range(num_shards):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_shard_worker,
+                args=(str(Path(persist_directory) / f"shard_{i}"), child_conn, search_threads, self.hnsw),
+                daemon=True
+            )
+            process.start()
+            child_conn.close()
+            self._processes.append(process)
+            self._conns.append(parent_conn)
+
+        self._readers = [
+            threading.Thread(target=self._read_replies, args=(shard,), name=f"shard-reader-{shard}", daemon=True)
+            for shard in range(num_shards)
+        ]
+        for reader in self._readers:
+            reader.start()
+
+        ready = self._collect(None, range(num_shards), startup_timeout_s)
+        if len(ready) < num_shards:
+            print(f"⚠️  Only {len(ready)}/{num_shards} shards started; searches will be partial")
+        print("✅ Shards ready!\n")
+
+    def shard_for(self, chunk_id) -> int:
+        return zlib.crc32(str(chunk_id).encode('utf-8')) % self.num_shards
+
+    def load_documents(self, chunks: Iterable[DocumentChunk], batch_size: int = 100):
+        """Hash-partition chunks across shards, keeping one load in flight per shard.
+
+        The parent embeds the next batch while shards index the previous ones.
+        """
+        buffers: List[List[DocumentChunk]] = [[] for _ in range(self.num_shards)]
+        in_flight: Dict[int, int] = {}
+
+        def send(shard: int):
+            batch = buffers[shard]
+            buffers[shard] = []
+            embeddings = np.asarray(self._embed([chunk.text for chunk in batch]), dtype=np.float32)
+            if shard in in_flight:
+                self._wait_load(shard, in_flight.pop(shard))
+            in_flight[shard] = self._submit("load", {shard: (batch, embeddings)})
+
+        for chunk in chunks:
+            shard = self.shard_for(chunk.chunk_id)
+            buffers[shard].append(chunk)
+            if len(buffers[shard]) >= batch_size:
+                send(shard)
+
+        for shard, batch in enumerate(buffers):
+            if batch:
+                send(shard)
+        for shard, request_id in in_flight.items():
+            self._wait_load(shard, request_id)
+
+    def search(self, query: str, n_results: int = 5, source: Optional[str] = None) -> Dict:
+        """Scatter the query vector to all shards and merge their top results"""
+        query_embeddings = np.asarray(self._embed([query]), dtype=np.float32)
+        payload = (query, query_embeddings, n_results, source)
+        request_id = self._submit("search", {shard: payload for shard in range(self.num_shards)})
+        responses = self._collect(request_id, range(self.num_shards), self.shard_timeout_s)
+
+        candidates = []
+        for result in responses.values():
+            candidates.extend(zip(
+                result["distances"],
+                result["documents"],
+                result["metadatas"]
+            ))
+
+        best = heapq.nsmallest(n_results, candidates, key=lambda item: item[0])
+        failed_shards = [shard for shard in range(self.num_shards) if shard not in responses]
+
+        return {
+            "documents": [doc for _, doc, _ in best],
+            "metadatas": [meta for _, _, meta in best],
+            "distances": [dist for dist, _, _ in best],
+            "partial": bool(failed_shards),
+            "failed_shards": failed_shards
+        }
+
+    def count(self) -> int:
+        """Total chunks across all shards"""
+        return sum(self._call_all("count").values())
+
+    def clear(self):
+        """Clear every shard"""
+        self._call_all("clear")
+
+    def close(self):
+        """Stop all shard workers"""
+        self._closing = True
+        for shard in range(self.num_shards):
+            self._send(shard, (None, "stop", None))
+
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    def _embed(self, texts: List[str]):
+        with _EMBEDDING_LOCK:
+            return self.embedding_function(texts)
+
+    def _send(self, shard: int, message) -> bool:
+        if not self._alive[shard]:
+            return False
+        try:
+            with self._send_locks[shard]:
+                self._conns[shard].send(message)
+            return True
+        except (BrokenPipeError, OSError):
+            print(f"❌ Shard {shard} unreachable")
+            return False
+
+    def _submit(self, op: str, payloads: Dict[int, object]) -> int:
+        """Send one tagged request to each shard in ``payloads``; replies queue up under its id"""
+        request_id = next(self._request_ids)
+        replies: "queue.Queue" = queue.Queue()
+        with self._pending_lock:
+            self._pending[request_id] = replies
+
+        for shard, payload in payloads.items():
+            if not self._send(shard, (request_id, op, payload)):
+                replies.put((shard, "error", "unreachable"))
+        return request_id
+
+    def _call_all(self, op: str) -> Dict[int, object]:
+        request_id = self._submit(op, {shard: None for shard in range(self.num_shards)})
+        return self._collect(request_id, range(self.num_shards), None)
+
+    def _wait_load(self, shard: int, request_id: int):
+        if shard not in self._collect(request_id, [shard], None):
+            raise RuntimeError(f"Shard {shard} failed to load documents")
+
+    def _collect(self, request_id: Optional[int], shards: Iterable[int], timeout: Optional[float]) -> Dict[int, object]:
+        """Wait for one request's replies until all shards answer or time runs out"""
+        with self._pending_lock:
+            replies = self._pending[request_id]
+
+        waiting = set(shards)
+        responses = {}
+        deadline = None if timeout is None else time.time() + timeout
+
+        try:
+            while waiting:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                try:
+                    shard, status, result = replies.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+                waiting.discard(shard)
+                if status == "ok":
+                    responses[shard] = result
+                else:
+                    print(f"❌ Shard {shard} error: {result}")
+        finally:
+            # Late answers to requests that already timed out are dropped
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+
+        return responses
+
+    def _read_replies(self, shard: int):
+        """Reader thread: route each reply from one shard to the request waiting on it"""
+        conn = self._conns[shard]
+        while True:
+            try:
+                request_id, status, result = conn.recv()
+            except (EOFError, OSError):
+                break
+
+            with self._pending_lock:
+                replies = self._pending.get(request_id)
+            if replies is not None:
+                replies.put((shard, status, result))
+
+        # Fail everything still waiting on this shard instead of letting it hang
+        self._alive[shard] = False
+        if not self._closing:
+            print(f"❌ Shard {shard} exited")
+        with self._pending_lock:
+            pending = list(self._pending.values())
+        for replies in pending:
+            replies.put((shard, "error", "exited"))
+
+if __name__ == "__main__":
+    store_dir = Path(__file__).parent.parent / "data" / "processed" / "chunk_store"
+
+    if not (store_dir / "chunks.idx").exists():
+        print(f"❌ Chunk store not found at: {store_dir}")
+        print("Please run: python src\\data_processing.py")
+        exit(1)
+
+    sharded_store = ShardedVectorStore()
+    chunks = ChunkStore(str(store_dir))
+
+    print(f"📥 Loading {len(chunks)} chunks across {sharded_store.num_shards} shards...")
+    sharded_store.clear()
+    sharded_store.load_documents(chunks)
+    print(f"✅ Loaded {sharded_store.count()} chunks\n")
+
+    test_query = "How do I cancel my trial?"
+    start_time = time.time()
+    results = sharded_store.search(test_query, n_results=3)
+    elapsed_ms = int((time.time() - start_time) * 1000)
+
+    print(f"Query: '{test_query}' ({elapsed_ms}ms, partial: {results['partial']})")
+    for i, (meta, dist) in enumerate(zip(results['metadatas'], results['distances']), 1):
+        print(f"{i}. Source: {meta['source']} (Page {meta['page']}) - distance {dist:.3f}")
+
+    sharded_store.close()
@@ -0,0 +1,160 @@
+# src/tenant_manager.py
+import chromadb
+from chromadb.config import Settings
+from chromadb.utils import embedding_functions
+from collections import OrderedDict
+from datetime import datetime
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+from models import DocumentChunk, QueryCategory, TenantMetrics
+from vector_store import VectorStore, load_hnsw_config
+
+# Tenant IDs become part of Chroma collection names, which only allow
+# [a-zA-Z0-9._-]. Underscores are reserved for partition suffixes.
+_TENANT_ID = re.compile(r"^[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,40}[a-zA-Z0-9])?$")
+
+class TenantStoreManager:
+    """Serves many tenant knowledge bases from one process.
+
+    Each tenant gets its own collection (``tenant-<id>``) in a shared Chroma
+    client, and every tenant's VectorStore shares a single embedding model.
+    Stores are opened on first use and kept in LRU order; when the estimated
+    footprint of resident tenants exceeds the memory budget, the coldest
+    tenants are evicted. Chroma's own segment cache is given the same budget
+    so evicted indexes are actually released.
+    """
+
+    def __init__(
+        self,
+        persist_directory: str = "./chroma_db",
+        memory_budget_bytes: int = 512 * 1024 * 1024,
+        bytes_per_chunk: int = 4096,
+        partitioned: bool = False
+    ):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.bytes_per_chunk = bytes_per_chunk
+        self.partitioned = partitioned
+
+        self.client = chromadb.PersistentClient(
+            path=persist_directory,
+            settings=Settings(
+                chroma_segment_cache_policy="LRU",
+                chroma_memory_limit_bytes=memory_budget_bytes
+            )
+        )
+
+        # One embedding model and one set of index settings for every tenant
+        self.hnsw = load_hnsw_config(persist_directory)
+        self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
+            model_name="all-MiniLM-L6-v2"
+        )
+
+        self._stores: "OrderedDict[str, VectorStore]" = OrderedDict()
+        self._metrics: Dict[str, TenantMetrics] = {}
+        self._lock = threading.RLock()
+
+    def collection_name(self, tenant_id: str) -> str:
+        if not _TENANT_ID.match(tenant_id):
+            raise ValueError(f"Invalid tenant id: {tenant_id!r}")
+        return f"tenant-{tenant_id}"
+
+    def get(self, tenant_id: str) -> VectorStore:
+        """Return the tenant's store, opening it (and evicting cold tenants) if needed"""
+        collection_name = self.collection_name(tenant_id)
+
+        with self._lock:
+            metrics = self._metrics.setdefault(tenant_id, TenantMetrics(tenant_id=tenant_id))
+            metrics.last_access = datetime.utcnow()
+
+            if tenant_id in self._stores:
+                self._stores.move_to_end(tenant_id)
+                metrics.hits += 1
+                return self._stores[tenant_id]
+
+            start_time = time.time()
+            store = VectorStore(
+                partitioned=self.partitioned,
+                collection_name=collection_name,
+                client=self.client,
+                embedding_function=self.embedding_function,
+                hnsw=self.hnsw
+            )
+            self._stores[tenant_id] = store
+
+            metrics.loads += 1
+            metrics.resident = True
+            metrics.last_load_ms = int((time.time() - start_time) * 1000)
+            self._update_footprint(tenant_id)
+            self._evict_over_budget(keep=tenant_id)
+
+            return store
+
+    def load_documents(self, tenant_id: str, chunks: Iterable[DocumentChunk]):
+        """Load chunks into a tenant's knowledge base"""
+        with self._lock:
+            store = self.get(tenant_id)
+            store.load_documents(chunks)
+            self._update_footprint(tenant_id)
+            self._evict_over_budget(keep=tenant_id)
+
+    def evict(self, tenant_id: str) -> bool:
+        """Drop a tenant's store from memory; it is reopened on next use"""
+        with self._lock:
+            if self._stores.pop(tenant_id, None) is None:
+                return False
+
+            metrics = self._metrics[tenant_id]
+            metrics.resident = False
+            metrics.evictions += 1
+            return True
+
+    def delete(self, tenant_id: str):
+        """Permanently delete a tenant's knowledge base"""
+        collection_name = self.collection_name(tenant_id)
+        # Delete by name rather than opening the store, which could evict hot tenants
+        names = [collection_name] + [f"{collection_name}_{category.value}" for category in QueryCategory]
+
+        with self._lock:
+            # Older Chroma versions list names, newer ones Collection objects
+            existing = {c if isinstance(c, str) else c.name for c in self.client.list_collections()}
+            for name in names:
+                if name in existing:
+                    self.client.delete_collection(name)
+            self._stores.pop(tenant_id, None)
+            self._metrics.pop(tenant_id, None)
+
+    def resident_tenants(self) -> List[str]:
+        """Tenants currently loaded, coldest first"""
+        with self._lock:
+            return list(self._stores)
+
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return sum(self._metrics[tenant_id].estimated_bytes for tenant_id in self._stores)
+
+    def metrics(self) -> Dict[str, TenantMetrics]:
+        """Per-tenant load, hit and eviction counters"""
+        with self._lock:
+            return {tenant_id: m.copy() for tenant_id, m in self._metrics.items()}
+
+    def _update_footprint(self, tenant_id: str):
+        store = self._stores[tenant_id]
+        metrics = self._metrics[tenant_id]
+        metrics.chunks = store.collection.count()
+
+        # Partitions hold a second copy of every vector
+        copies = 2 if store.partitions else 1
+        metrics.estimated_bytes = metrics.chunks * self.bytes_per_chunk * copies
+
+    def _evict_over_budget(self, keep: str):
+        for tenant_id in list(self._stores):
+            if self.resident_bytes() <= self.memory_budget_bytes:
+                break
+            if tenant_id != keep:
+                self.evict(tenant_id)
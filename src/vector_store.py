@@ -1,41 +1,133 @@
 # src/vector_store.py
 import chromadb
+from chromadb.api.types import EmbeddingFunction
 from chromadb.utils import embedding_functions
+import heapq
 import json
+import threading
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterable, Optional
 import sys
 
 sys.path.insert(0, str(Path(__file__).parent))
-from models import DocumentChunk
+from models import DocumentChunk, HNSWConfig, QueryCategory
+from chunk_store import ChunkStore
+from query_router import matching_categories, route_query
+from profiling import profiler
+
+# HuggingFace fast tokenizers raise "Already borrowed" when one model is used
+# from several threads at once, and every store in a process normally shares
+# one embedding model (see tenant_manager.py), so all embedding goes through
+# this lock. Chroma calls are not locked; tests/test_concurrency.py checks
+# concurrent loads and searches on one store.
+_EMBEDDING_LOCK = threading.Lock()
+
+HNSW_CONFIG_FILE = "hnsw_config.json"
+
+def load_hnsw_config(persist_directory: str) -> HNSWConfig:
+    """Index settings written by hnsw_tune.py, or the defaults (cosine space)"""
+    path = Path(persist_directory) / HNSW_CONFIG_FILE
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            return HNSWConfig(**json.load(f))
+    return HNSWConfig()
+
+def save_hnsw_config(persist_directory: str, config: HNSWConfig) -> Path:
+    path = Path(persist_directory) / HNSW_CONFIG_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config.dict(), f, indent=2)
+    return path
 
 class VectorStore:
     """ChromaDB vector store for document retrieval"""
     
-    def __init__(self, persist_directory: str = "./chroma_db"):
-        self.client = chromadb.PersistentClient(path=persist_directory)
+    def __init__(
+        self,
+        persist_directory: str = "./chroma_db",
+        partitioned: bool = False,
+        min_route_confidence: float = 0.5,
+        second_partition_confidence: float = 0.2,
+        collection_name: str = "flow_docs",
+        client: Optional[chromadb.ClientAPI] = None,
+        embedding_function: Optional[EmbeddingFunction] = None,
+        hnsw: Optional[HNSWConfig] = None,
+        precomputed_embeddings: bool = False
+    ):
+        # A shared client and embedding model can be passed in (see tenant_manager.py)
+        self.client = client or chromadb.PersistentClient(path=persist_directory)
         
-        # Use sentence transformers for embeddings
-        self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2"
-        )
+        # Distance space and HNSW parameters apply when a collection is created;
+        # existing collections keep theirs until rebuilt (see clear())
+        self.hnsw = hnsw or load_hnsw_config(persist_directory)
+        
+        # Use sentence transformers for embeddings, unless the caller always
+        # supplies vectors itself (shard workers, see sharded_store.py)
+        if precomputed_embeddings:
+            self.embedding_function = None
+        else:
+            self.embedding_function = embedding_function or embedding_functions.SentenceTransformerEmbeddingFunction(
+                model_name="all-MiniLM-L6-v2"
+            )
         
         # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name="flow_docs",
-            embedding_function=self.embedding_function,
-            metadata={"description": "Wispr Flow documentation"}
-        )
+        self.collection_name = collection_name
+        self.collection = self._get_collection(collection_name, "Wispr Flow documentation")
+        
+        # Category partitions: one sub-index per QueryCategory, searched
+        # instead of the global collection when the query routes confidently
+        self.partitioned = partitioned
+        self.min_route_confidence = min_route_confidence
+        self.second_partition_confidence = second_partition_confidence
+        self.partitions = {
+            category.value: self._get_collection(
+                self._partition_name(category.value),
+                f"Wispr Flow documentation ({category.value})"
+            )
+            for category in QueryCategory
+        } if partitioned else {}
         
         print("🔧 Initializing vector store...")
         print("✅ Vector store ready!\n")
     
-    def load_documents(self, chunks: List[DocumentChunk]):
-        """Load document chunks from old JSON structure"""
+    def _partition_name(self, category: str) -> str:
+        return f"{self.collection_name}_{category}"
+    
+    def _get_collection(self, name: str, description: str, recreate: bool = False):
+        """Open (or recreate) a collection with the configured space and HNSW parameters"""
+        metadata = {"description": description, **self.hnsw.collection_metadata()}
+        if recreate:
+            self.client.delete_collection(name)
+            return self.client.create_collection(
+                name=name,
+                embedding_function=self.embedding_function,
+                metadata=metadata
+            )
+        
+        collection = self.client.get_or_create_collection(
+            name=name,
+            embedding_function=self.embedding_function,
+            metadata=metadata
+        )
+        
+        # Chroma defaults to l2; relevance scores assume the configured space
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        if space != self.hnsw.space:
+            print(f"⚠️  Collection '{name}' uses {space} distance, not {self.hnsw.space} - "
+                  f"relevance scores will be off until it is rebuilt (python src/vector_store.py)")
+        return collection
+    
+    @profiler.track_memory("load_documents")
+    def load_documents(self, chunks: Iterable[DocumentChunk], batch_size: int = 100, embeddings: Optional[List] = None):
+        """Load document chunks, streaming them into the collection in batches.
+        
+        ``embeddings``, if given, are precomputed vectors aligned with ``chunks``.
+        """
         
         texts = []
         metadatas = []
         ids = []
+        loaded = 0
         
         for chunk in chunks:
             texts.append(chunk.text)
@@ -46,63 +138,155 @@ class VectorStore:
                 "category": chunk.category or "general"
             })
             ids.append(str(chunk.chunk_id))
-        
-        # Add to collection in batches
-        batch_size = 100
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i+batch_size]
-            batch_metadatas = metadatas[i:i+batch_size]
-            batch_ids = ids[i:i+batch_size]
             
-            self.collection.add(
-                documents=batch_texts,
-                metadatas=batch_metadatas,
-                ids=batch_ids
+            if len(texts) >= batch_size:
+                self._add_batch(texts, metadatas, ids, self._slice(embeddings, loaded, len(texts)))
+                loaded += len(texts)
+                texts, metadatas, ids = [], [], []
+        
+        if texts:
+            self._add_batch(texts, metadatas, ids, self._slice(embeddings, loaded, len(texts)))
+    
+    @staticmethod
+    def _slice(embeddings: Optional[List], start: int, count: int) -> Optional[List]:
+        return None if embeddings is None else embeddings[start:start + count]
+    
+    def _add_batch(self, texts: List[str], metadatas: List[Dict], ids: List[str], embeddings: Optional[List] = None):
+        # Embed once; the global collection and the partitions share the vectors
+        if embeddings is None:
+            embeddings = self._embed(texts)
+        
+        self.collection.add(
+            documents=texts,
+            embeddings=embeddings,
+            metadatas=metadatas,
+            ids=ids
+        )
+        
+        if self.partitioned:
+            self._add_to_partitions(texts, embeddings, metadatas, ids)
+    
+    def _embed(self, texts: List[str]):
+        if self.embedding_function is None:
+            raise ValueError("This store takes precomputed embeddings only")
+        with _EMBEDDING_LOCK:
+            return self.embedding_function(texts)
+    
+    def _add_to_partitions(self, texts: List[str], embeddings, metadatas: List[Dict], ids: List[str]):
+        """Route a batch of chunks to every category partition whose keywords they match"""
+        grouped = {}
+        for text, embedding, metadata, chunk_id in zip(texts, embeddings, metadatas, ids):
+            for category in matching_categories(text):
+                group = grouped.setdefault(category.value, ([], [], [], []))
+                group[0].append(text)
+                group[1].append(embedding)
+                group[2].append(metadata)
+                group[3].append(chunk_id)
+        
+        for category, (group_texts, group_embeddings, group_metadatas, group_ids) in grouped.items():
+            self.partitions[category].add(
+                documents=group_texts,
+                embeddings=group_embeddings,
+                metadatas=group_metadatas,
+                ids=group_ids
             )
     
-    def search(self, query: str, n_results: int = 5) -> Dict:
-        """Search for relevant documents"""
+    def search(self, query: str, n_results: int = 5, source: Optional[str] = None, query_embeddings: Optional[List] = None) -> Dict:
+        """Search for relevant documents, optionally restricted to one source"""
+        where = {"source": source} if source else None
+        
+        # Embed once (unless the caller already did) and reuse the vector for every collection searched
+        if query_embeddings is None:
+            query_embeddings = self._embed([query])
+        
+        if self.partitioned:
+            routes = route_query(query)
+            if routes and routes[0][1] >= self.min_route_confidence:
+                results = self._search_partitions(query_embeddings, routes, n_results, where)
+                # Thin partitions can't fill the result list - use the global index
+                if len(results["documents"]) >= n_results:
+                    return results
         
         results = self.collection.query(
-            query_texts=[query],
-            n_results=n_results
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where
         )
         
         # Return in format compatible with old agent
         return {
             "documents": results['documents'][0],
             "metadatas": results['metadatas'][0],
-            "distances": results['distances'][0]
+            "distances": results['distances'][0],
+            "partitions": [self.collection.name]
+        }
+    
+    def _search_partitions(self, query_embeddings, routes: List, n_results: int, where: Optional[Dict]) -> Dict:
+        """Search the top one or two category partitions and merge by distance"""
+        categories = [routes[0][0].value]
+        if len(routes) > 1 and routes[1][1] >= self.second_partition_confidence:
+            categories.append(routes[1][0].value)
+        
+        # A chunk can live in both partitions searched; keep it once
+        candidates = {}
+        for category in categories:
+            results = self.partitions[category].query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=where
+            )
+            for chunk_id, dist, doc, meta in zip(
+                results['ids'][0],
+                results['distances'][0],
+                results['documents'][0],
+                results['metadatas'][0]
+            ):
+                candidates.setdefault(chunk_id, (dist, doc, meta))
+        
+        best = heapq.nsmallest(n_results, candidates.values(), key=lambda item: item[0])
+        
+        return {
+            "documents": [doc for _, doc, _ in best],
+            "metadatas": [meta for _, _, meta in best],
+            "distances": [dist for dist, _, _ in best],
+            "partitions": [self._partition_name(category) for category in categories]
         }
     
     def clear(self):
-        """Clear all documents from collection"""
-        self.client.delete_collection("flow_docs")
-        self.collection = self.client.create_collection(
-            name="flow_docs",
-            embedding_function=self.embedding_function
-        )
+        """Clear all documents from collection and its partitions"""
+        self.collection = self._get_collection(self.collection_name, "Wispr Flow documentation", recreate=True)
+        
+        for category in list(self.partitions):
+            self.partitions[category] = self._get_collection(
+                self._partition_name(category),
+                f"Wispr Flow documentation ({category})",
+                recreate=True
+            )
 
 if __name__ == "__main__":
-    # Initialize vector store
-    vector_store = VectorStore()
+    # Initialize vector store (builds category partitions alongside the global index)
+    vector_store = VectorStore(partitioned=True)
     
-    # Path to chunks file
-    chunks_path = Path(__file__).parent.parent / "data" / "processed" / "document_chunks.json"
+    # Chunk store written by data_processing.py; the legacy JSON file is still accepted
+    processed_dir = Path(__file__).parent.parent / "data" / "processed"
+    store_dir = processed_dir / "chunk_store"
+    chunks_path = processed_dir / "document_chunks.json"
     
-    if not chunks_path.exists():
-        print(f"❌ Chunks file not found at: {chunks_path}")
+    if (store_dir / "chunks.idx").exists():
+        print(f"📥 Loading chunks from: {store_dir}")
+        chunks = ChunkStore(str(store_dir))
+    elif chunks_path.exists():
+        print(f"📥 Loading chunks from: {chunks_path}")
+        with open(chunks_path, 'r', encoding='utf-8') as f:
+            chunks_data = json.load(f)
+        
+        # Convert to DocumentChunk objects
+        chunks = [DocumentChunk(**chunk) for chunk in chunks_data]
+    else:
+        print(f"❌ Chunk store not found at: {store_dir}")
         print("Please run: python src\\data_processing.py")
         exit(1)
     
-    # Load chunks directly from JSON
-    print(f"📥 Loading chunks from: {chunks_path}")
-    with open(chunks_path, 'r', encoding='utf-8') as f:
-        chunks_data = json.load(f)
-    
-    # Convert to DocumentChunk objects
-    chunks = [DocumentChunk(**chunk) for chunk in chunks_data]
-    
     print(f"📥 Loading {len(chunks)} chunks into vector store...")
     
     # Clear and reload
@@ -125,6 +309,6 @@ if __name__ == "__main__":
         results['distances']
     ), 1):
         print(f"{i}. Source: {meta['source']} (Page {meta['page']})")
-        print(f"   Relevance: {(1-dist)*100:.1f}%")
+        print(f"   Relevance: {max(0.0, 1 - dist)*100:.1f}%")
         print(f"   Preview: {doc[:100]}...")
         print()
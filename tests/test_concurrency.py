@@ -0,0 +1,141 @@
+# test_concurrency.py
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from admission import AdmissionController, AgentBusyError
+from models import DocumentChunk
+from vector_store import VectorStore
+
+THREADS = 8
+CHUNKS_PER_THREAD = 20
+TOTAL_CHUNKS = 2 * THREADS * CHUNKS_PER_THREAD
+
+class AngleEmbedding:
+    """Embeds "chunk <i>" as a unit vector at its own angle, so the exact top hit is known.
+
+    Like a HuggingFace fast tokenizer, it fails if two threads call it at once.
+    """
+
+    def __init__(self):
+        self._busy = threading.Lock()
+
+    def __call__(self, input):
+        if not self._busy.acquire(blocking=False):
+            raise RuntimeError("Already borrowed")
+        try:
+            time.sleep(0.001)
+            angles = [int(text.split()[1]) * math.pi / TOTAL_CHUNKS for text in input]
+            return [[math.cos(angle), math.sin(angle)] for angle in angles]
+        finally:
+            self._busy.release()
+
+    @staticmethod
+    def name():
+        return "angle-test"
+
+def _chunks(start: int, count: int):
+    return [
+        DocumentChunk(text=f"chunk {i} of the test corpus", source="test.pdf", page=1, chunk_id=i)
+        for i in range(start, start + count)
+    ]
+
+@pytest.fixture
+def store(tmp_path):
+    return VectorStore(persist_directory=str(tmp_path), embedding_function=AngleEmbedding())
+
+def test_concurrent_loads_and_searches(store):
+    # Every thread loads its own chunks at the same time
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        for future in [pool.submit(store.load_documents, _chunks(t * CHUNKS_PER_THREAD, CHUNKS_PER_THREAD), 5)
+                       for t in range(THREADS)]:
+            future.result()
+    loaded = THREADS * CHUNKS_PER_THREAD
+    assert store.collection.count() == loaded
+
+    # Searches for loaded chunks run while a second set is being loaded
+    def search(i):
+        return store.search(f"chunk {i}", n_results=1)["documents"][0]
+
+    with ThreadPoolExecutor(max_workers=THREADS * 2) as pool:
+        loads = [pool.submit(store.load_documents, _chunks(loaded + t * CHUNKS_PER_THREAD, CHUNKS_PER_THREAD), 5)
+                 for t in range(THREADS)]
+        searches = {i: pool.submit(search, i) for i in range(loaded)}
+        for future in loads:
+            future.result()
+        for i, future in searches.items():
+            assert future.result() == f"chunk {i} of the test corpus"
+
+    assert store.collection.count() == 2 * loaded
+
+class BlockingAgent:
+    """Stub agent that holds every request until released, then echoes the query"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_response(self, query: str, **kwargs):
+        with self._lock:
+            self.calls += 1
+        self.release.wait(timeout=10)
+        return SimpleNamespace(response=f"answer to {query}", queue_time_ms=None)
+
+def _wait_for(condition, timeout_s: float = 5.0):
+    deadline = time.time() + timeout_s
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_admission_under_concurrent_load():
+    agent = BlockingAgent()
+    admission = AdmissionController(agent, max_workers=2, max_queue=3, per_session_limit=1)
+    capacity = 5
+    sessions = 12
+
+    outcomes = {}
+    def submit(session):
+        try:
+            outcomes[session] = admission.submit(f"s{session}", f"q{session}").response
+        except AgentBusyError:
+            outcomes[session] = "busy"
+
+    # Fill every worker and queue slot, then send the overflow
+    threads = [threading.Thread(target=submit, args=(s,)) for s in range(capacity)]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: admission.metrics()["admitted"] == capacity)
+
+    overflow = [threading.Thread(target=submit, args=(s,)) for s in range(capacity, sessions)]
+    for thread in overflow:
+        thread.start()
+    for thread in overflow:
+        thread.join(timeout=5)
+
+    # A second request from an admitted session is turned away
+    with pytest.raises(AgentBusyError):
+        admission.submit("s0", "again")
+
+    agent.release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    admission.shutdown()
+
+    metrics = admission.metrics()
+    assert metrics["admitted"] == metrics["completed"] == capacity
+    assert metrics["rejected_busy"] == sessions - capacity
+    assert metrics["rejected_session"] == 1
+    assert agent.calls == capacity
+    for session in range(capacity):
+        assert outcomes[session] == f"answer to q{session}"
+    for session in range(capacity, sessions):
+        assert outcomes[session] == "busy"
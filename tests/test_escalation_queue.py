@@ -0,0 +1,64 @@
+# test_escalation_queue.py
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from escalation_queue import EscalationSink, read_escalation_log
+from models import EscalationDecision, QueryCategory
+
+def _decision(priority: str = "medium") -> EscalationDecision:
+    return EscalationDecision(
+        should_escalate=True,
+        reason="Test escalation",
+        category=QueryCategory.GENERAL,
+        priority=priority,
+        suggested_team="general"
+    )
+
+def _wait_for(condition, timeout_s: float = 5.0):
+    deadline = time.time() + timeout_s
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+def _failing_sink(tmp_path):
+    """Sink whose log path is a directory, so every write fails until it is removed"""
+    log_path = tmp_path / "escalations.jsonl"
+    log_path.mkdir()
+    sink = EscalationSink(log_path=str(log_path), batch_size=2, flush_interval_s=0.05, max_backoff_s=60.0)
+    for i in range(7):
+        assert sink.submit(f"query {i}", _decision())
+    _wait_for(lambda: sink.metrics()["write_errors"] >= 1)
+    return sink, log_path
+
+def test_close_during_retry_writes_everything_queued(tmp_path):
+    sink, log_path = _failing_sink(tmp_path)
+
+    # The writer is backing off; the log recovers and the sink is closed
+    log_path.rmdir()
+    sink.close()
+
+    metrics = sink.metrics()
+    assert len(list(read_escalation_log(str(log_path)))) == 7
+    assert metrics["written"] == 7
+    assert metrics["queue_depth"] == 0
+    assert metrics["unwritten"] == 0
+    assert metrics["abandoned"] == 0
+
+def test_close_with_failing_log_abandons_and_counts(tmp_path):
+    sink, _ = _failing_sink(tmp_path)
+    sink.close()
+
+    metrics = sink.metrics()
+    assert metrics["written"] == 0
+    assert metrics["abandoned"] == 7
+    assert metrics["queue_depth"] == 0
+
+    # Every item was settled, so flush() must not hang
+    flusher = threading.Thread(target=sink.flush, daemon=True)
+    flusher.start()
+    flusher.join(timeout=2.0)
+    assert not flusher.is_alive()
@@ -1,12 +1,18 @@
 # ui/app.py
 import streamlit as st
+import math
 import sys
+import uuid
 from pathlib import Path
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
 
 from agent_gemini import FlowSupportAgent
+from escalation_queue import EscalationSink
+from analytics import AnalyticsLog
+from admission import AdmissionController, AgentBusyError
+from session_store import SessionHistoryStore
 
 st.set_page_config(
     page_title="FlowSupport AI - CS Operations Demo",
@@ -14,16 +20,31 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize agent
+# Initialize agent - one instance shared by every browser session, so all
+# calls go through a bounded admission layer instead of running directly
 @st.cache_resource
 def load_agent():
-    return FlowSupportAgent()
+    agent = FlowSupportAgent(escalation_sink=EscalationSink(), analytics=AnalyticsLog())
+    return AdmissionController(agent, max_workers=4, max_queue=8, per_session_limit=1)
 
-agent = load_agent()
+admission = load_agent()
+
+@st.cache_resource
+def load_history_store():
+    return SessionHistoryStore()
+
+history_store = load_history_store()
+
+# Older messages beyond this cap are spilled to the server-side history store
+MAX_SESSION_MESSAGES = 40
+HISTORY_PAGE_SIZE = 10
 
 # Initialize session state
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 if "messages" not in st.session_state:
     st.session_state.messages = []
+    st.session_state.archived_messages = 0
 if "query_count" not in st.session_state:
     st.session_state.query_count = 0
     st.session_state.escalations = 0
@@ -72,6 +93,14 @@ with st.sidebar:
         if st.button(q, key=f"example_{q}", use_container_width=True):
             st.session_state.current_query = q
     
+    # Ending the conversation also drops its server-side archive; abandoned
+    # sessions are removed by the history store's age/size cleanup
+    if st.button("🧹 New conversation", use_container_width=True):
+        history_store.delete(st.session_state.session_id)
+        st.session_state.messages = []
+        st.session_state.archived_messages = 0
+        st.rerun()
+    
     st.divider()
     
     st.subheader("🎯 TAM Productivity Impact")
@@ -87,33 +116,83 @@ with st.sidebar:
 # Main chat interface
 st.subheader("💬 Customer Support Interface")
 
-# Display chat messages
-for message in st.session_state.messages:
+def render_details(metadata: dict):
+    """Metrics expander for one assistant message"""
+    with st.expander("📊 Agent Intelligence Details"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Confidence", metadata["confidence"].upper())
+        with col2:
+            st.metric("Relevance", f"{metadata['relevance']:.1%}")
+        with col3:
+            st.metric("Response Time", f"{metadata['time']}ms")
+        
+        if metadata.get("queue_time"):
+            st.caption(f"Waited {metadata['queue_time']}ms for a free worker")
+        
+        if metadata["escalated"]:
+            st.error(f"🚨 **ESCALATED TO: {(metadata.get('team') or 'Support').upper()}**")
+            st.caption(f"Reason: {metadata['escalation_reason']}")
+            st.caption(f"Priority: {metadata.get('priority', 'medium').upper()}")
+        
+        if metadata["clarification"]:
+            st.info("💬 Context gathering - asking follow-up question")
+        
+        if metadata["docs"]:
+            st.write("**Retrieved Knowledge:**")
+            for i, (source, page, relevance) in enumerate(metadata["docs"], 1):
+                st.caption(f"{i}. {source} (Page {page}) - {relevance:.1%} match")
+
+def render_message(message: dict, detailed: bool):
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
         
-        if message["role"] == "assistant" and "metadata" in message:
-            with st.expander("📊 Agent Intelligence Details"):
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("Confidence", message["metadata"]["confidence"].upper())
-                with col2:
-                    st.metric("Relevance", f"{message['metadata']['relevance']:.1%}")
-                with col3:
-                    st.metric("Response Time", f"{message['metadata']['time']}ms")
-                
-                if message["metadata"]["escalated"]:
-                    st.error(f"🚨 **ESCALATED TO: {message['metadata'].get('team', 'Support').upper()}**")
-                    st.caption(f"Reason: {message['metadata']['escalation_reason']}")
-                    st.caption(f"Priority: {message['metadata'].get('priority', 'medium').upper()}")
-                
-                if message["metadata"]["clarification"]:
-                    st.info("💬 Context gathering - asking follow-up question")
-                
-                if message["metadata"]["docs"]:
-                    st.write("**Retrieved Knowledge:**")
-                    for i, doc in enumerate(message["metadata"]["docs"][:3], 1):
-                        st.caption(f"{i}. {doc['source']} (Page {doc['page']}) - {doc['relevance']:.1%} match")
+        metadata = message.get("metadata")
+        if metadata and detailed:
+            render_details(metadata)
+        elif metadata:
+            # Earlier turns get a one-line summary instead of the full expander
+            status = f"escalated to {metadata.get('team') or 'support'}" if metadata["escalated"] else metadata["confidence"]
+            st.caption(f"{status} · {metadata['relevance']:.0%} relevance · {metadata['time']}ms")
+
+@st.fragment
+def render_history():
+    """Earlier turns, collapsed and paginated; paging reruns only this fragment"""
+    recent = st.session_state.messages[:-2]
+    archived = st.session_state.archived_messages
+    total = archived + len(recent)
+    if total == 0:
+        return
+    
+    if not st.toggle(f"🕘 Show earlier conversation ({total} messages)", key="show_history"):
+        return
+    
+    pages = math.ceil(total / HISTORY_PAGE_SIZE)
+    page = st.number_input("Page", min_value=1, max_value=pages, value=pages, key="history_page")
+    start = (page - 1) * HISTORY_PAGE_SIZE
+    end = min(start + HISTORY_PAGE_SIZE, total)
+    
+    # Archived messages are read back from the server-side store on demand
+    page_messages = []
+    if start < archived:
+        page_messages = history_store.read(st.session_state.session_id, start, min(end, archived))
+    page_messages += recent[max(start - archived, 0):max(end - archived, 0)]
+    
+    for message in page_messages:
+        render_message(message, detailed=False)
+
+def spill_history():
+    """Keep session state bounded by archiving the oldest messages"""
+    overflow = len(st.session_state.messages) - MAX_SESSION_MESSAGES
+    if overflow > 0:
+        history_store.append(st.session_state.session_id, st.session_state.messages[:overflow])
+        del st.session_state.messages[:overflow]
+        st.session_state.archived_messages += overflow
+
+# Display chat messages: only the latest exchange is rendered in full
+render_history()
+for message in st.session_state.messages[-2:]:
+    render_message(message, detailed=True)
 
 # Chat input
 if prompt := st.chat_input("Ask about Wispr Flow...") or st.session_state.get("current_query"):
@@ -129,7 +208,13 @@ if prompt := st.chat_input("Ask about Wispr Flow...") or st.session_state.get("c
     # Generate response
     with st.chat_message("assistant"):
         with st.spinner("Processing..."):
-            result = agent.generate_response(prompt)
+            try:
+                result = admission.submit(st.session_state.session_id, prompt)
+            except AgentBusyError as e:
+                # Fail fast under overload; drop the unanswered question so it can be resent
+                st.session_state.messages.pop()
+                st.warning(f"⏳ {e.reason}. Please retry in about {e.retry_after_s}s.")
+                st.stop()
             
             # Update metrics
             st.session_state.query_count += 1
@@ -146,28 +231,32 @@ if prompt := st.chat_input("Ask about Wispr Flow...") or st.session_state.get("c
             
             st.markdown(result.response)
             
-            # Add to chat history
+            # Add to chat history, keeping only the metadata the view needs
+            metadata = {
+                "confidence": result.confidence,
+                "relevance": result.avg_relevance_score,
+                "time": result.processing_time_ms,
+                "queue_time": result.queue_time_ms,
+                "escalated": result.escalation.should_escalate,
+                "clarification": result.escalation.reason == "Requesting device clarification",
+                "docs": [
+                    (doc.source, doc.page, doc.relevance_score)
+                    for doc in result.retrieved_docs[:3]
+                ]
+            }
+            if result.escalation.should_escalate:
+                metadata.update(
+                    escalation_reason=result.escalation.reason,
+                    priority=result.escalation.priority,
+                    team=result.escalation.suggested_team
+                )
+            
             st.session_state.messages.append({
                 "role": "assistant",
                 "content": result.response,
-                "metadata": {
-                    "confidence": result.confidence,
-                    "relevance": result.avg_relevance_score,
-                    "time": result.processing_time_ms,
-                    "escalated": result.escalation.should_escalate,
-                    "escalation_reason": result.escalation.reason,
-                    "priority": result.escalation.priority,
-                    "team": result.escalation.suggested_team,
-                    "clarification": result.escalation.reason == "Requesting device clarification",
-                    "docs": [
-                        {
-                            "source": doc.source,
-                            "page": doc.page,
-                            "relevance": doc.relevance_score
-                        } for doc in result.retrieved_docs[:3]
-                    ]
-                }
+                "metadata": metadata
             })
+            spill_history()
 
 # Footer
 st.divider()